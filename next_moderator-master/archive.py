@@ -0,0 +1,218 @@
+import argparse
+import datetime as dt
+import json
+
+import pandas as pd
+
+from formats import read_frames, write_frames
+from core import end_of_archive
+from leaderboard import month_of
+from workbook import SHEETS
+
+# the histories only ever grow, but the app only shows their newest draws and counts.
+# compact() moves the closed months out of the data file into archive partitions next to it,
+# one file per month in the format of the data file:
+#   archive/moderators.2024-05.xlsx   the draws of that month, of both histories
+#   moderators.archive.json           per month and history, the moderations per moderator
+# so a load only reads the months that are still open, and the leaderboards and the fair draw
+# start from the archived counts instead. full_frames() puts the whole history back together
+# for exports and audits:
+#   python -m archive compact --data-dir data --keep-months 1
+#   python -m archive export --data-dir data --output everything.xlsx
+# The partitions and the counts are written before the smaller data file, so a crash or a
+# conflicting save in between loses nothing: the rows are archived again and found to be in
+# their partition already. Until then the rows are in both places, so the rows of a history
+# in the data file that are older than its last archived month are never read together with
+# the archive: the counts and full_frames() take them from the archive alone. A draw made
+# later for an archived month goes to its partition, and into the counts, with the next
+# compaction.
+
+HISTORIES = SHEETS[1:]
+
+
+class Archive:
+    def __init__(self, months=None):
+        self.months = months or {}  # "YYYY-MM" -> {history: {moderator: count}}
+
+    # the counts of one history for HistoryAggregate.sync(), oldest month first
+    def counts(self, sheet_name):
+        return tuple(
+            (dt.date.fromisoformat(month + "-01"), mod, count)
+            for month in sorted(self.months)
+            for mod, count in sorted(self.months[month].get(sheet_name, {}).items())
+        )
+
+    def to_json(self):
+        return json.dumps({"months": self.months}, sort_keys=True).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(json.loads(data)["months"])
+
+
+def manifest_name(file_name):
+    return file_name.rsplit(".", 1)[0] + ".archive.json"
+
+
+def partition_name(file_name, month):
+    base, extension = file_name.rsplit(".", 1)
+    return f"archive/{base}.{month}.{extension}"
+
+
+# the archived counts, an empty archive if the data was never compacted
+def read_archive(files, file_name):
+    data = files.read(manifest_name(file_name))
+    return Archive.from_json(data) if data else Archive()
+
+
+def empty_frames():
+    return (
+        pd.DataFrame({"moderator": [], "is_active": []}).astype(
+            {"moderator": object, "is_active": bool}
+        ),
+        pd.DataFrame({"date": [], "moderator": []}, dtype=object),
+        pd.DataFrame({"date": [], "moderator": []}, dtype=object),
+    )
+
+
+def read_partition(files, file_name, month):
+    name = partition_name(file_name, month)
+    data = files.read(name)
+    return read_frames(data, name) if data else empty_frames()
+
+
+# adds the draws of a month, {history: df}, to its partition and updates the month's counts
+# in `archive`. Draws that are in the partition already are not added again
+def add_to_partition(files, file_name, archive, month, histories):
+    stored = read_partition(files, file_name, month)
+    month_frames = [stored[0]]
+    counts = archive.months.setdefault(month, {})
+    for sheet_name, stored_df in zip(HISTORIES, stored[1:]):
+        merged = (
+            pd.concat([stored_df, histories[sheet_name]], ignore_index=True)
+            .drop_duplicates()
+            .sort_values("date", kind="stable", ignore_index=True)
+        )
+        month_frames.append(merged)
+        counts[sheet_name] = {
+            mod: int(count) for mod, count in merged["moderator"].value_counts().items()
+        }
+    name = partition_name(file_name, month)
+    files.write(name, write_frames(month_frames, name))
+
+
+def first_of_month(date, months_back=0):
+    month = date.year * 12 + date.month - 1 - months_back
+    return dt.date(month // 12, month % 12 + 1, 1)
+
+
+# the draws before `before` are archived, but at least the newest `keep_rows` stay in the data
+# file for the previous moderators and the recent window: then the months they are in stay
+def archive_before(df, before, keep_rows):
+    if len(df) <= keep_rows:
+        return dt.date.min
+    if keep_rows:
+        before = min(before, first_of_month(sorted(df["date"])[-keep_rows]))
+    return before
+
+
+# archives the months before the `keep_months` closed months before today's month, returns the
+# archived months
+def compact(storage, today=None, keep_months=1, keep_rows=8):
+    before = first_of_month(today or dt.date.today(), keep_months)
+
+    def split(frames):
+        moderators_df, *histories = frames
+        old, recent = {}, [moderators_df]
+        for sheet_name, df in zip(HISTORIES, histories):
+            is_old = (df["date"] < archive_before(df, before, keep_rows)).to_numpy(bool)
+            old[sheet_name] = df[is_old]
+            recent.append(df[~is_old].reset_index(drop=True))
+        return old, tuple(recent)
+
+    old, _ = split(storage.load())
+    if not any(len(df) for df in old.values()):
+        return []
+    archived_months = []
+
+    def change(frames):
+        old, recent = split(frames)
+        months = sorted({month_of(date) for df in old.values() for date in df["date"]})
+        archive = read_archive(storage.files, storage.file_name)
+        for month in months:
+            add_to_partition(
+                storage.files,
+                storage.file_name,
+                archive,
+                month,
+                {
+                    sheet_name: df[[month_of(date) == month for date in df["date"]]]
+                    for sheet_name, df in old.items()
+                },
+            )
+        storage.files.write(manifest_name(storage.file_name), archive.to_json())
+        archived_months[:] = months
+        return recent
+
+    storage.update(change)
+    return archived_months
+
+
+# the rows of a history in the data file that are not older than its archive
+def unarchived(df, archive, sheet_name):
+    archived_until = end_of_archive(archive.counts(sheet_name))
+    if archived_until is None:
+        return df
+    return df[(df["date"] >= archived_until).to_numpy(bool)].reset_index(drop=True)
+
+
+# the data with the archived months of the histories in front of the recent ones
+def full_frames(storage):
+    archive = read_archive(storage.files, storage.file_name)
+    moderators_df, *histories = storage.load()
+    parts = {sheet_name: [] for sheet_name in HISTORIES}
+    for month in sorted(archive.months):
+        stored = read_partition(storage.files, storage.file_name, month)
+        for sheet_name, df in zip(HISTORIES, stored[1:]):
+            parts[sheet_name].append(df)
+    return (moderators_df,) + tuple(
+        pd.concat(
+            parts[sheet_name] + [unarchived(df, archive, sheet_name)],
+            ignore_index=True,
+        )
+        for sheet_name, df in zip(HISTORIES, histories)
+    )
+
+
+def main():
+    from scheduler import add_storage_arguments, open_storage
+
+    parser = argparse.ArgumentParser(
+        description="Move closed months of the histories to the archive, or export all."
+    )
+    parser.add_argument("command", choices=["compact", "export"])
+    parser.add_argument("--output", help="export: the .xlsx file to write")
+    parser.add_argument(
+        "--keep-months", type=int, default=1, help="closed months not archived"
+    )
+    parser.add_argument("--keep-rows", type=int, default=8)
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+    if not args.data_dir and not args.container:
+        parser.error("either --data-dir or --container is required")
+    if args.command == "export" and not args.output:
+        parser.error("export needs --output")
+
+    storage = open_storage(args)
+    if args.command == "compact":
+        months = compact(
+            storage, keep_months=args.keep_months, keep_rows=args.keep_rows
+        )
+        print("archived", ", ".join(months) if months else "nothing")
+    else:
+        with open(args.output, "wb") as f:
+            f.write(storage.export())
+
+
+if __name__ == "__main__":
+    main()
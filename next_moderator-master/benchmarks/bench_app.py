@@ -0,0 +1,169 @@
+import argparse
+import datetime as dt
+import json
+import os
+import statistics
+import sys
+import time
+from unittest import mock
+
+import streamlit as st
+import streamlit.logger
+from streamlit.testing.v1 import AppTest
+
+import charts
+from benchmarks.synthetic import make_frames, make_workbook
+from fake_blob import FakeBlobServiceClient
+from formats import write_frames
+
+# end-to-end timings of the real app, driven through streamlit's AppTest with the in-memory
+# fake_blob standing in for the blob service, on synthetic rosters and histories:
+#   cold load        first run of the script with empty caches
+#   warm rerun       the same run again, everything cached
+#   draw             "Get Lucky!" without saving: the draw and both leaderboards
+#   draw and save    "Get Lucky!" with "Save Results"
+#   roster save      "Save" on the Moderators page, after switching someone to inactive
+# usage: python -m benchmarks.bench_app [--rosters 5 50 500] [--histories 100 10000 ...]
+#            [--format xlsx|arrow|parquet] [--save baseline.json] [--compare baseline.json]
+# With --compare it exits with 1 when an action got slower than `--tolerance` times its
+# baseline (plus 10ms of noise), so it can guard against regressions.
+# The 1M row histories take minutes as xlsx, --format arrow keeps them fast.
+
+APP = os.path.join(os.path.dirname(os.path.dirname(__file__)), "next_moderator.py")
+ROSTERS = [5, 50, 500]
+HISTORIES = [100, 10_000, 100_000, 1_000_000]
+ACTIONS = ["cold load", "warm rerun", "draw", "draw and save", "roster save"]
+
+
+# the standup page is closed on weekends, so the app always runs on a Wednesday. Other code
+# still sees every real datetime as a datetime.datetime
+class WednesdayType(type):
+    def __instancecheck__(cls, instance):
+        return isinstance(instance, REAL_DATETIME)
+
+
+REAL_DATETIME = dt.datetime
+
+
+class Wednesday(dt.datetime, metaclass=WednesdayType):
+    @classmethod
+    def today(cls, tz=None):
+        return cls(2026, 10, 14, 10)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 10, 14, 10)
+
+
+def upload(connection_string, roster_size, history_rows, file_name):
+    frames = make_frames(history_rows, roster_size)
+    data = (
+        make_workbook(frames)
+        if file_name.endswith(".xlsx")
+        else write_frames(frames, file_name)
+    )
+    service = FakeBlobServiceClient.from_connection_string(connection_string)
+    service.get_blob_client("bench", file_name).upload_blob(data, overwrite=True)
+
+
+def timed_run(run):
+    start = time.perf_counter()
+    app_test = run()
+    elapsed = time.perf_counter() - start
+    if app_test.exception:
+        raise RuntimeError(app_test.exception[0].value)
+    return elapsed
+
+
+def measure(roster_size, history_rows, file_name, repeat):
+    connection_string = f"bench-{roster_size}-{history_rows}-{file_name}"
+    upload(connection_string, roster_size, history_rows, file_name)
+    # empty caches, like a freshly started server
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    charts.build_chart_spec.cache_clear()
+
+    app_test = AppTest.from_file(APP, default_timeout=600)
+    app_test.secrets["blob_credentials"] = {
+        "connection_string": connection_string,
+        "container_name": "bench",
+    }
+    app_test.secrets["settings"] = {"data_file": file_name}
+    timings = {action: [] for action in ACTIONS}
+    timings["cold load"].append(timed_run(app_test.run))
+    for _ in range(repeat):
+        timings["warm rerun"].append(timed_run(app_test.run))
+        app_test.checkbox[0].uncheck()
+        timings["draw"].append(timed_run(app_test.button[0].click().run))
+        app_test.checkbox[0].check()
+        timings["draw and save"].append(timed_run(app_test.button[0].click().run))
+    app_test.selectbox[0].select("😎 Moderators").run()
+    for position in range(repeat):
+        # the editor's key changes with every version of the roster
+        app_test.session_state[app_test.dataframe[0].key] = {
+            "edited_rows": {position % roster_size: {"isActive": False}},
+            "added_rows": [],
+            "deleted_rows": [],
+        }
+        timings["roster save"].append(timed_run(app_test.button[0].click().run))
+    return {action: statistics.median(values) for action, values in timings.items()}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, seconds in results.items():
+        if key in baseline and seconds > baseline[key] * tolerance + 0.010:
+            regressions.append(
+                f"{key}: {seconds * 1000:.0f}ms, baseline {baseline[key] * 1000:.0f}ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rosters", type=int, nargs="+", default=ROSTERS)
+    parser.add_argument("--histories", type=int, nargs="+", default=HISTORIES)
+    parser.add_argument(
+        "--format", default="xlsx", choices=["xlsx", "arrow", "parquet"]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write the timings to this baseline file")
+    parser.add_argument("--compare", help="baseline file to check the timings against")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    # the app is run without a server, which streamlit warns about on every run
+    streamlit.logger.set_log_level("error")
+    results = {}
+    print(f"{'roster':>6} {'history':>8} " + " ".join(f"{a:>13}" for a in ACTIONS))
+    with mock.patch("blob_files.BlobServiceClient", FakeBlobServiceClient), mock.patch(
+        "datetime.datetime", Wednesday
+    ):
+        for roster_size in args.rosters:
+            for history_rows in args.histories:
+                timings = measure(
+                    roster_size, history_rows, f"moderators.{args.format}", args.repeat
+                )
+                print(
+                    f"{roster_size:>6} {history_rows:>8} "
+                    + " ".join(f"{timings[a] * 1000:>11.0f}ms" for a in ACTIONS),
+                    flush=True,
+                )
+                for action, seconds in timings.items():
+                    results[f"{args.format}/{roster_size}/{history_rows}/{action}"] = (
+                        seconds
+                    )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("slower:", regression)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_frames
+from formats import FORMATS, read_frames, write_frames
+from storage import LocalFiles
+
+# save and load latency of moderators.xlsx against the columnar formats
+# usage: python -m benchmarks.bench_formats [history rows ...]
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes):
+    files = LocalFiles(tempfile.mkdtemp())
+    print(
+        f"{'rows':>10} {'format':>8} {'MB':>7} {'save':>9} {'load':>9} {'load mmap':>10}"
+    )
+    for rows in sizes:
+        frames = make_frames(rows)
+        repeat = 3 if rows <= 100_000 else 1
+        for fmt in FORMATS:
+            # xlsx is too slow to be useful past 100k rows
+            if fmt == "xlsx" and rows > 100_000:
+                continue
+            file_name = f"moderators.{fmt}"
+            save = best_of(lambda: write_frames(frames, file_name), repeat)
+            data = write_frames(frames, file_name)
+            files.write(file_name, data)
+            load = best_of(lambda: read_frames(data, file_name), repeat)
+            load_mmap = best_of(
+                lambda: read_frames(files.map(file_name), file_name), repeat
+            )
+            print(
+                f"{rows:>10} {fmt:>8} {len(data) / 1e6:>7.2f} {save:>8.3f}s {load:>8.3f}s {load_mmap:>9.3f}s"
+            )
+            os.remove(files.path(file_name))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
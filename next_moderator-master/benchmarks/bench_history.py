@@ -0,0 +1,84 @@
+import datetime as dt
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_frames
+from core import draw_record
+from records import add_next_mod, apply_records
+
+# what one click costs on long histories, through the calls the app makes: add_next_mod for
+# the session's own frame and apply_records with the single draw, which runs on every save and
+# on every rerun while write-ahead entries are pending. "old" is apply_draws as it was before,
+# with a copy of the frame and a dict of every date's position for every batch.
+# Then `appends` consecutive draws, each applied to the frame the previous one returned.
+# usage: python -m benchmarks.bench_history [appends] [history rows ...]
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def old_apply_draws(df, draws):
+    df = df.copy()
+    positions = {date: i for i, date in enumerate(df["date"])}
+    new_rows = {}
+    for next_date, next_mod, replaces in draws:
+        if next_date in new_rows:
+            if new_rows[next_date] == replaces:
+                new_rows[next_date] = next_mod
+        elif next_date in positions:
+            position = positions[next_date], df.columns.get_loc("moderator")
+            if df.iat[position] == replaces:
+                df.iat[position] = next_mod
+        elif replaces is None:
+            new_rows[next_date] = next_mod
+    if new_rows:
+        insert_df = pd.DataFrame(
+            {"date": list(new_rows), "moderator": list(new_rows.values())}
+        )
+        df = pd.concat([df, insert_df], ignore_index=True)
+    return df
+
+
+def per_call(run, number=5):
+    start = time.perf_counter()
+    for _ in range(number):
+        result = run()
+    return (time.perf_counter() - start) / number * 1e3, result
+
+
+def consecutive(frames, appends):
+    next_date = frames[1]["date"].iloc[-1]
+    start = time.perf_counter()
+    for i in range(appends):
+        next_date += dt.timedelta(days=2)
+        record = draw_record("standup_history", next_date, f"Moderator {i % 12:03d}")
+        frames = apply_records(frames, [record])
+    return (time.perf_counter() - start) / appends * 1e3
+
+
+def main(appends=1_000, sizes=SIZES):
+    print(f"{'rows':>10} {'call':>14} {'app':>10} {'old':>10}")
+    for rows in sizes:
+        frames = make_frames(rows)
+        standup_df = frames[1]
+        next_date = standup_df["date"].iloc[-1] + dt.timedelta(days=2)
+        next_mod = standup_df["moderator"].iloc[0]
+        draw = (next_date, next_mod, None)
+        record = draw_record("standup_history", *draw)
+        add_ms, _ = per_call(lambda: add_next_mod(standup_df, next_mod, next_date))
+        app_ms, app_df = per_call(lambda: apply_records(frames, [record])[1])
+        old_ms, old_df = per_call(lambda: old_apply_draws(standup_df, [draw]))
+        assert app_df.equals(old_df)
+        print(f"{rows:>10} {'add_next_mod':>14} {add_ms:>8.2f}ms")
+        print(f"{rows:>10} {'apply_records':>14} {app_ms:>8.2f}ms {old_ms:>8.2f}ms")
+        if rows <= 100_000:
+            print(
+                f"{rows:>10} {'consecutive':>14} {consecutive(frames, appends):>8.2f}ms"
+                f" per draw over {appends} draws"
+            )
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args[:1], args[1:] or SIZES)
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+
+# cold start of the modules that are meant to be imported without the app, measured with
+# python -X importtime in a fresh interpreter. Fails (exit code 1) when a module goes over its
+# budget or pulls in one of the heavy dependencies it is meant to stay clear of.
+# usage: python -m benchmarks.bench_import [runs]
+
+# module -> budget in milliseconds for its whole import, dependencies included
+BUDGETS_MS = {
+    "core": 25,
+    "scheduler": 40,
+}
+HEAVY = ["pandas", "numpy", "pyarrow", "altair", "azure", "streamlit", "openpyxl"]
+# reported as well, without a budget
+OTHERS = ["storage", "blob_files", "charts", "leaderboard"]
+
+
+# returns the cumulative import time in microseconds of the module, the slowest modules it
+# imported (microseconds, name) and the heavy dependencies it loaded
+def measure(module):
+    script = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, indented by depth
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative), name[1:].rstrip()))
+    # a module's own imports are listed right before it, one level deeper
+    position = next(i for i, (_, name) in enumerate(times) if name == module)
+    total = times[position][0]
+    dependencies = []
+    for cumulative, name in reversed(times[:position]):
+        if not name.startswith(" "):
+            break
+        if not name.startswith("   "):
+            dependencies.append((cumulative, name.strip()))
+    return total, sorted(dependencies, reverse=True)[:3], result.stdout.split()
+
+
+def main(runs=5):
+    failed = False
+    print(f"{'module':>12} {'import':>9} {'budget':>8}  slowest dependencies")
+    for module in list(BUDGETS_MS) + OTHERS:
+        # the fastest of a few runs, the first ones also pay for a cold file cache
+        total, slowest, heavy = min(measure(module) for _ in range(runs))
+        budget = BUDGETS_MS.get(module)
+        verdict = ""
+        if budget is not None and (total / 1000 > budget or heavy):
+            failed = True
+            verdict = "  OVER BUDGET" + (
+                f", imports {', '.join(heavy)}" if heavy else ""
+            )
+        print(
+            f"{module:>12} {total / 1000:>7.1f}ms {budget or '':>6}{'ms' if budget else '  '}  "
+            + ", ".join(
+                f"{name} {cumulative / 1000:.0f}ms" for cumulative, name in slowest
+            )
+            + verdict
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,46 @@
+import random
+import sys
+import timeit
+
+from benchmarks.synthetic import make_history, make_roster
+from core import RecentWindow, pick_next_mod
+
+# one draw with the old rejection loop against the recent-moderator window, on long histories
+# usage: python -m benchmarks.bench_selection [history rows ...]
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def old_get_next_mod(df, available_team, threshold):
+    prev_mod = df.unique().tolist()[:threshold]
+    next_mod = random.choice(available_team)
+    while next_mod in prev_mod:
+        next_mod = random.choice(available_team)
+    return next_mod
+
+
+def new_get_next_mod(df, available_team, threshold):
+    recent_mods = RecentWindow.from_newest_first(df.to_numpy(), threshold)
+    return pick_next_mod(available_team, recent_mods)
+
+
+def main(sizes):
+    names = make_roster(12)["moderator"].tolist()
+    print(f"{'rows':>10} {'threshold':>9} {'old':>10} {'new':>10} {'speedup':>8}")
+    for rows in sizes:
+        newest_first = make_history(rows, names)["moderator"][::-1]
+        for threshold in (1, 3):
+            number = 20
+            old = timeit.timeit(
+                lambda: old_get_next_mod(newest_first, names, threshold), number=number
+            )
+            new = timeit.timeit(
+                lambda: new_get_next_mod(newest_first, names, threshold), number=number
+            )
+            print(
+                f"{rows:>10} {threshold:>9} {old / number * 1e6:>8.0f}us {new / number * 1e6:>8.0f}us {old / new:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,66 @@
+import random
+import sys
+import time
+
+import numpy as np
+
+from core import RecentWindow, pick_next_mod
+from simulate import simulate
+
+# the vectorized simulation against the same draws done one by one with core.pick_next_mod,
+# with fixed seeds so every run prints the same numbers
+# usage: python -m benchmarks.bench_simulate [seeds] [years] [workers]
+
+TEAM_SIZE = 12
+THRESHOLDS = (1, 3)
+DRAWS_PER_YEAR = 156
+
+
+# per-person count variance and back-to-back rate of one python-level simulation per seed
+def python_loop(threshold, years, seeds):
+    team = list(range(TEAM_SIZE))
+    variances, back_to_back = [], 0
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        order = team[:]
+        rng.shuffle(order)
+        window = RecentWindow.from_newest_first(order, threshold)
+        counts = [0] * TEAM_SIZE
+        previous = order[0]
+        for _ in range(years * DRAWS_PER_YEAR):
+            mod, _ = pick_next_mod(team, window, rng)
+            window.push(mod)
+            counts[mod] += 1
+            back_to_back += mod == previous
+            previous = mod
+        variances.append(np.var(counts))
+    return np.mean(variances), back_to_back / (seeds * years * DRAWS_PER_YEAR)
+
+
+def main(seeds=200, years=10, workers=1):
+    draws = seeds * years * DRAWS_PER_YEAR
+    print(f"{seeds} seeds x {years} years, {draws} draws per threshold")
+    for threshold in THRESHOLDS:
+        start = time.perf_counter()
+        variance, back_to_back = python_loop(threshold, years, seeds)
+        loop_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        numbers = simulate(
+            TEAM_SIZE, [threshold], years, seeds, DRAWS_PER_YEAR, workers=workers
+        )[threshold]
+        numpy_seconds = time.perf_counter() - start
+        print(
+            f"threshold {threshold}: python loop {loop_seconds:6.2f}s "
+            f"({draws / loop_seconds / 1e6:5.2f}M draws/s, count var {variance:6.1f}, "
+            f"back-to-back {back_to_back:.2%})"
+        )
+        print(
+            f"             numpy       {numpy_seconds:6.2f}s "
+            f"({draws / numpy_seconds / 1e6:5.2f}M draws/s, count var "
+            f"{numbers['count_variance']:6.1f}, back-to-back {numbers['back_to_back_rate']:.2%})"
+            f"  {loop_seconds / numpy_seconds:.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
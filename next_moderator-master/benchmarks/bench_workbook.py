@@ -0,0 +1,50 @@
+import io
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_frames, make_workbook
+from workbook import read_workbook
+
+# compares the old three-parse get_data() body with the single-pass read_workbook()
+# usage: python -m benchmarks.bench_workbook [history rows ...]
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def read_three_times(blob_file):
+    moderators_df = pd.read_excel(io.BytesIO(blob_file), sheet_name="moderators")
+    standup_df = pd.read_excel(io.BytesIO(blob_file), sheet_name="standup_history")
+    retro_df = pd.read_excel(io.BytesIO(blob_file), sheet_name="retrospective_history")
+
+    standup_df["date"] = pd.to_datetime(standup_df["date"], format="%Y-%m-%d").dt.date
+    retro_df["date"] = pd.to_datetime(retro_df["date"], format="%Y-%m-%d").dt.date
+    return moderators_df, standup_df, retro_df
+
+
+def best_of(function, blob_file, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(blob_file)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes):
+    print(
+        f"{'rows':>10} {'xlsx MB':>8} {'3x read_excel':>14} {'read_workbook':>14} {'speedup':>8}"
+    )
+    for rows in sizes:
+        blob_file = make_workbook(make_frames(rows))
+        repeat = 3 if rows <= 100_000 else 1
+        old = best_of(read_three_times, blob_file, repeat)
+        new = best_of(read_workbook, blob_file, repeat)
+        print(
+            f"{rows:>10} {len(blob_file) / 1e6:>8.2f} {old:>13.3f}s {new:>13.3f}s {old / new:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
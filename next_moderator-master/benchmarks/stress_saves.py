@@ -0,0 +1,101 @@
+import datetime as dt
+import sys
+import threading
+import time
+
+from benchmarks.synthetic import make_frames
+from blob_files import BlobFiles
+from coalescer import WriteCoalescer
+from core import draw_record
+from fake_blob import FakeBlobServiceClient
+from formats import read_frames, write_frames
+from records import apply_records
+from storage import SnapshotStorage
+
+# hammers one data file with draws from many threads and checks that none of them is lost.
+# Every thread stands for a separate Streamlit server with its own client and ETag cache,
+# the coalesced run for many sessions of the same server.
+# usage: python -m benchmarks.stress_saves [threads] [draws per thread]
+
+FILE_NAME = "moderators.xlsx"
+
+
+def new_container(name):
+    container_client = FakeBlobServiceClient.from_connection_string(
+        name
+    ).get_container_client("stress")
+    BlobFiles(container_client).write(
+        FILE_NAME, write_frames(make_frames(100), FILE_NAME)
+    )
+    return container_client
+
+
+def draw(thread_number, draw_number, draws):
+    # every draw gets its own date, so each one must end up in the history
+    next_date = dt.date(2100, 1, 1) + dt.timedelta(
+        days=thread_number * draws + draw_number
+    )
+    return draw_record("standup_history", next_date, f"Moderator {thread_number:03d}")
+
+
+# the old save: apply the draw to a stale copy and overwrite whatever is there
+def blind_save(files, records):
+    frames = apply_records(read_frames(files.read(FILE_NAME), FILE_NAME), records)
+    files.write(FILE_NAME, write_frames(frames, FILE_NAME))
+
+
+def run_threads(threads, draws, save):
+    def worker(thread_number):
+        for draw_number in range(draws):
+            save(thread_number, [draw(thread_number, draw_number, draws)])
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return time.perf_counter() - start
+
+
+def check(container_client, name, threads, draws, elapsed):
+    _, standup_df, _ = SnapshotStorage(BlobFiles(container_client)).load()
+    saved = int((standup_df["date"] >= dt.date(2100, 1, 1)).sum())
+    uploads = container_client.account.stats["uploads"] - 1
+    print(
+        f"{name:>10}: {saved}/{threads * draws} draws saved, {uploads} uploads, {elapsed:.2f}s"
+    )
+    return saved == threads * draws
+
+
+def main(threads=8, draws=10):
+    container_client = new_container("blind")
+    files = [BlobFiles(container_client) for _ in range(threads)]
+    elapsed = run_threads(
+        threads, draws, lambda i, records: blind_save(files[i], records)
+    )
+    check(container_client, "blind", threads, draws, elapsed)
+
+    container_client = new_container("optimistic")
+    storages = [
+        SnapshotStorage(BlobFiles(container_client), max_attempts=1000)
+        for _ in range(threads)
+    ]
+    elapsed = run_threads(
+        threads, draws, lambda i, records: storages[i].append(records)
+    )
+    ok = check(container_client, "optimistic", threads, draws, elapsed)
+
+    container_client = new_container("coalesced")
+    coalescer = WriteCoalescer(SnapshotStorage(BlobFiles(container_client)))
+    elapsed = run_threads(
+        threads, draws, lambda i, records: coalescer.submit(records).result()
+    )
+    ok = check(container_client, "coalesced", threads, draws, elapsed) and ok
+
+    if not ok:
+        sys.exit("draws were lost")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,59 @@
+import io
+import random
+import datetime as dt
+
+import pandas as pd
+import xlsxwriter
+
+# synthetic data shaped like moderators.xlsx, used by the benchmark scripts
+
+
+def make_roster(size=12):
+    names = [f"Moderator {i:03d}" for i in range(size)]
+    return pd.DataFrame(
+        {
+            "moderator": names,
+            "is_active": [i % 6 != 5 for i in range(size)],
+        }
+    )
+
+
+# the dates are spread over at most `span_days`, so very long histories get several rows per day
+# instead of running past the dates Excel and pandas can represent
+def make_history(rows, names, step_days=2, seed=0, span_days=36_500):
+    rng = random.Random(seed)
+    start = dt.date(1990, 1, 1)
+    step = min(step_days, span_days / rows)
+    return pd.DataFrame(
+        {
+            "date": [start + dt.timedelta(days=int(step * i)) for i in range(rows)],
+            "moderator": [rng.choice(names) for _ in range(rows)],
+        }
+    )
+
+
+def make_frames(history_rows, roster_size=12, seed=0):
+    moderators_df = make_roster(roster_size)
+    names = moderators_df["moderator"].tolist()
+    standup_df = make_history(history_rows, names, 2, seed)
+    retro_df = make_history(max(history_rows // 7, 1), names, 14, seed + 1)
+    return moderators_df, standup_df, retro_df
+
+
+# xlsxwriter in constant memory mode, so even the 1M row workbooks can be generated
+def make_workbook(frames):
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "in_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    sheet_names = ("moderators", "standup_history", "retrospective_history")
+    for df, sheet_name in zip(frames, sheet_names):
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, list(df.columns))
+        for row_number, row in enumerate(df.itertuples(index=False), start=1):
+            for col_number, value in enumerate(row):
+                if isinstance(value, dt.date):
+                    worksheet.write_datetime(row_number, col_number, value, date_format)
+                else:
+                    worksheet.write(row_number, col_number, value)
+    workbook.close()
+    return output.getvalue()
@@ -0,0 +1,150 @@
+import threading
+
+import requests
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrument import timed
+from storage import WriteConflict
+
+# the file access of storage.py on an azure blob container, see LocalFiles for the interface
+
+
+# one client for the whole process: every request reuses the pooled, already open
+# connections instead of paying for a new TLS handshake
+def connect_blob_container(connection_string, container_name, pool_size=10):
+    session = requests.Session()
+    # azure retries in its own pipeline, the adapter must not retry as well
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=False, redirect=False, raise_on_status=False),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)  # the Azurite emulator is served over http
+    transport = RequestsTransport(session=session, session_owner=False)
+    blob_service_client = BlobServiceClient.from_connection_string(
+        connection_string, transport=transport
+    )
+    return blob_service_client.get_container_client(container_name)
+
+
+# whole-file reads are cached with their ETag and only downloaded again when the blob changed,
+# an unchanged blob costs a conditional GET (If-None-Match) answered with 304 Not Modified
+# names can be put under a prefix (e.g. "teams/blue/"), so several shards share one container
+class BlobFiles:
+    def __init__(self, container_client, prefix=""):
+        self.container_client = container_client
+        self.prefix = prefix
+        self.cache = {}  # name -> (etag, data)
+        self.lock = threading.Lock()
+
+    def blob_client(self, name):
+        return self.container_client.get_blob_client(self.prefix + name)
+
+    @timed("io.read")
+    def read(self, name, offset=0):
+        if offset:
+            blob_client = self.blob_client(name)
+            try:
+                # reading at the end of the blob is an error in azure, so check the size first
+                if offset >= blob_client.get_blob_properties().size:
+                    return b""
+                return blob_client.download_blob(offset=offset).readall()
+            except ResourceNotFoundError:
+                return None
+        data, _ = self.read_versioned(name)
+        return data
+
+    @timed("io.etag")
+    def etag(self, name):
+        try:
+            return self.blob_client(name).get_blob_properties().etag
+        except ResourceNotFoundError:
+            return None
+
+    @timed("io.read_versioned")
+    def read_versioned(self, name):
+        blob_client = self.blob_client(name)
+        with self.lock:
+            cached = self.cache.get(name)
+        try:
+            if cached is None:
+                downloader = blob_client.download_blob()
+            else:
+                try:
+                    downloader = blob_client.download_blob(
+                        etag=cached[0], match_condition=MatchConditions.IfModified
+                    )
+                except HttpResponseError as error:
+                    if error.status_code != 304:
+                        raise
+                    return cached[1], cached[0]
+        except ResourceNotFoundError:
+            with self.lock:
+                self.cache.pop(name, None)
+            return None, None
+        data = downloader.readall()
+        etag = downloader.properties.etag
+        with self.lock:
+            self.cache[name] = (etag, data)
+        return data, etag
+
+    # a download is always a copy, there is nothing to map
+    @timed("io.map")
+    def map(self, name):
+        return self.read(name)
+
+    @timed("io.write")
+    def write(self, name, data):
+        blob_client = self.blob_client(name)
+        response = blob_client.upload_blob(data, overwrite=True)
+        # what we just uploaded is the current version, no need to download it again
+        with self.lock:
+            self.cache[name] = (response["etag"], data)
+        return response["etag"]
+
+    # If-Match on the etag, or create-only when there was no file
+    @timed("io.write_if_unchanged")
+    def write_if_unchanged(self, name, data, etag):
+        blob_client = self.blob_client(name)
+        try:
+            if etag is None:
+                response = blob_client.upload_blob(data, overwrite=False)
+            else:
+                response = blob_client.upload_blob(
+                    data,
+                    overwrite=True,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified,
+                )
+        except (ResourceModifiedError, ResourceExistsError, ResourceNotFoundError):
+            raise WriteConflict(name)
+        with self.lock:
+            self.cache[name] = (response["etag"], data)
+        return response["etag"]
+
+    # appends go to an append blob, which is created on first use
+    @timed("io.append")
+    def append(self, name, data):
+        blob_client = self.blob_client(name)
+        try:
+            blob_client.append_block(data)
+        except ResourceNotFoundError:
+            try:
+                # never replace a log another writer created in the meantime
+                blob_client.create_append_blob(
+                    match_condition=MatchConditions.IfMissing
+                )
+            except ResourceExistsError:
+                pass
+            blob_client.append_block(data)
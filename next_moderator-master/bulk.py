@@ -0,0 +1,401 @@
+import argparse
+import csv
+import datetime as dt
+import itertools
+import os
+
+import pandas as pd
+
+from archive import (
+    HISTORIES,
+    add_to_partition,
+    first_of_month,
+    manifest_name,
+    read_archive,
+    read_partition,
+    unarchived,
+)
+from leaderboard import month_of
+from workbook import to_date
+
+# moves whole histories in and out of a team's data in chunks, e.g. years of another team's
+# spreadsheets, without holding the source file in memory:
+#   python -m bulk import history.csv --data-dir data [--sheet standup_history]
+#   python -m bulk export everything.parquet --data-dir data
+# The format is picked from the extension: .csv (columns date, moderator and optionally
+# sheet), .xlsx (sheets named like the histories, or the first sheet for --sheet, read in
+# read-only mode) or .parquet (read and written one row group at a time).
+# Every row is validated and checked against a hash index of all the draws already stored,
+# archive included: a (history, date, moderator) that is stored already is a duplicate, another
+# moderator for a stored date a conflict, like a concurrent draw the stored one wins.
+# Draws older than the data file's first month go straight into the archive partitions of
+# their month (see archive.py), the newer ones are merged into the data file after every
+# chunk. Besides the data file and the hashes, no more than a chunk is held in memory.
+
+CHUNK_SIZE = 50_000
+
+
+class HashIndex:
+    def __init__(self):
+        # hashes instead of the values: collisions of 64 bit hashes are negligible here
+        self.rows = set()  # (history, date, moderator)
+        self.dates = set()  # (history, date)
+
+    def add(self, sheet_name, date, mod):
+        self.rows.add(hash((sheet_name, date.toordinal(), mod)))
+        self.dates.add(hash((sheet_name, date.toordinal())))
+
+    def add_frame(self, sheet_name, df):
+        for date, mod in zip(df["date"], df["moderator"]):
+            self.add(sheet_name, date, mod)
+
+    # "new" (and from now on indexed), "duplicate" or "conflict"
+    def check(self, sheet_name, date, mod):
+        if hash((sheet_name, date.toordinal(), mod)) in self.rows:
+            return "duplicate"
+        if hash((sheet_name, date.toordinal())) in self.dates:
+            return "conflict"
+        self.add(sheet_name, date, mod)
+        return "new"
+
+
+# ================ #
+#  READERS         #
+# ================ #
+
+# every reader yields chunks of (line, sheet, date, moderator) with the raw values
+
+
+def read_csv(path, sheet_name, chunk_size):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = (
+            (
+                line,
+                row.get("sheet") or sheet_name,
+                row.get("date"),
+                row.get("moderator"),
+            )
+            for line, row in enumerate(csv.DictReader(f), start=2)
+        )
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            yield chunk
+
+
+def read_xlsx(path, sheet_name, chunk_size):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = [name for name in workbook.sheetnames if name in HISTORIES] or [
+            workbook.sheetnames[0]
+        ]
+        for name in sheets:
+            rows = workbook[name].iter_rows(values_only=True)
+            header = [str(value).strip().lower() for value in next(rows, ())]
+            date_column, mod_column = header.index("date"), header.index("moderator")
+            target = name if name in HISTORIES else sheet_name
+            rows = (
+                (line, target, row[date_column], row[mod_column])
+                for line, row in enumerate(rows, start=2)
+                if any(value is not None for value in row)
+            )
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                yield chunk
+    finally:
+        workbook.close()
+
+
+def read_parquet(path, sheet_name, chunk_size):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [
+        name
+        for name in ("sheet", "date", "moderator")
+        if name in parquet_file.schema.names
+    ]
+    line = 0
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        data = batch.to_pydict()
+        sheets = data.get("sheet") or [sheet_name] * batch.num_rows
+        yield [
+            (line + i, sheet or sheet_name, date, mod)
+            for i, (sheet, date, mod) in enumerate(
+                zip(sheets, data["date"], data["moderator"]), start=1
+            )
+        ]
+        line += batch.num_rows
+
+
+READERS = {"csv": read_csv, "xlsx": read_xlsx, "parquet": read_parquet}
+
+
+# (sheet, date, moderator) of a raw row, or the reason it is invalid
+def validate(sheet_name, date, mod):
+    if sheet_name not in HISTORIES:
+        return None, f"unknown history {sheet_name!r}"
+    if isinstance(mod, str):
+        mod = mod.strip()
+    if not mod or not isinstance(mod, str):
+        return None, "no moderator"
+    try:
+        date = to_date(date)
+    except (TypeError, ValueError):
+        return None, f"invalid date {date!r}"
+    return (sheet_name, date, mod), None
+
+
+# ================ #
+#  IMPORT          #
+# ================ #
+
+
+class ImportReport:
+    def __init__(self):
+        self.counts = {"new": 0, "duplicate": 0, "conflict": 0, "invalid": 0}
+        self.archived = 0  # of the new draws, those that went into the archive
+        self.errors = []  # the first few invalid rows, (line, reason)
+        self.moderators = set()  # everyone in the new draws
+
+    def __str__(self):
+        lines = [
+            ", ".join(f"{count} {kind}" for kind, count in self.counts.items()),
+            f"{self.archived} of the new draws were archived",
+        ]
+        lines += [f"line {line}: {reason}" for line, reason in self.errors]
+        return "\n".join(lines)
+
+
+def import_history(storage, chunks, add_moderators=False, dry_run=False, max_errors=20):
+    files, file_name = storage.files, storage.file_name
+    frames = storage.load()
+    archive = read_archive(files, file_name)
+    index = HashIndex()
+    for sheet_name, df in zip(HISTORIES, frames[1:]):
+        index.add_frame(sheet_name, df)
+    # one month in memory at a time
+    for month in sorted(archive.months):
+        stored = read_partition(files, file_name, month)
+        for sheet_name, df in zip(HISTORIES, stored[1:]):
+            index.add_frame(sheet_name, df)
+    # older draws than the data file holds belong to the archive, an empty history takes all
+    archive_before = {
+        sheet_name: first_of_month(min(df["date"])) if len(df) else dt.date.min
+        for sheet_name, df in zip(HISTORIES, frames[1:])
+    }
+
+    report = ImportReport()
+    for chunk in chunks:
+        months = {}  # month -> {history: [(date, moderator)]}
+        recent = {sheet_name: [] for sheet_name in HISTORIES}
+        for line, *raw in chunk:
+            row, reason = validate(*raw)
+            if row is None:
+                report.counts["invalid"] += 1
+                if len(report.errors) < max_errors:
+                    report.errors.append((line, reason))
+                continue
+            outcome = index.check(*row)
+            report.counts[outcome] += 1
+            if outcome != "new":
+                continue
+            sheet_name, date, mod = row
+            report.moderators.add(mod)
+            if date < archive_before[sheet_name]:
+                month = months.setdefault(month_of(date), {s: [] for s in HISTORIES})
+                month[sheet_name].append((date, mod))
+                report.archived += 1
+            else:
+                recent[sheet_name].append((date, mod))
+        if dry_run:
+            continue
+        for month, histories in months.items():
+            add_to_partition(
+                files,
+                file_name,
+                archive,
+                month,
+                {
+                    sheet_name: pd.DataFrame(rows, columns=["date", "moderator"])
+                    for sheet_name, rows in histories.items()
+                },
+            )
+        if months:
+            # after every chunk, so the counts always match the partitions
+            files.write(manifest_name(file_name), archive.to_json())
+        if months or any(recent.values()):
+            # the chunk's recent draws go into the data file right away, so no more than a
+            # chunk is held besides the data. Also when only the archive changed: the new
+            # version makes the app read its counts
+            storage.update(lambda frames: merge_recent(frames, recent))
+
+    if dry_run:
+        return report
+    roster = set(frames[0]["moderator"])
+    unknown = sorted(report.moderators - roster)
+    if add_moderators and unknown:
+        # everyone is added inactive, a migrated history is no reason to be drawn
+        storage.append(
+            [
+                {
+                    "op": "roster_patch",
+                    "remove": [],
+                    "upsert": [
+                        {"moderator": mod, "is_active": False} for mod in unknown
+                    ],
+                }
+            ]
+        )
+    return report
+
+
+# the recent draws sorted into the histories, dates someone saved in the meantime keep theirs
+def merge_recent(frames, recent):
+    merged = [frames[0]]
+    for sheet_name, df in zip(HISTORIES, frames[1:]):
+        stored_dates = set(df["date"])
+        rows = [
+            (date, mod) for date, mod in recent[sheet_name] if date not in stored_dates
+        ]
+        if rows:
+            df = pd.concat(
+                [df, pd.DataFrame(rows, columns=["date", "moderator"])],
+                ignore_index=True,
+            ).sort_values("date", kind="stable", ignore_index=True)
+        merged.append(df)
+    return tuple(merged)
+
+
+# ================ #
+#  EXPORT          #
+# ================ #
+
+
+# (history, df) chunks of the whole history, the archive one month at a time and oldest first
+def history_chunks(storage):
+    archive = read_archive(storage.files, storage.file_name)
+    for month in sorted(archive.months):
+        stored = read_partition(storage.files, storage.file_name, month)
+        for sheet_name, df in zip(HISTORIES, stored[1:]):
+            if len(df):
+                yield sheet_name, df
+    for sheet_name, df in zip(HISTORIES, storage.load()[1:]):
+        yield sheet_name, unarchived(df, archive, sheet_name)
+
+
+def write_csv(path, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sheet", "date", "moderator"])
+        for sheet_name, df in chunks:
+            writer.writerows(
+                (sheet_name, date.isoformat(), mod)
+                for date, mod in zip(df["date"], df["moderator"])
+            )
+
+
+# xlsxwriter's constant memory mode writes every row out as soon as the next one starts
+def write_xlsx(path, chunks):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    worksheets, rows = {}, {}
+    for sheet_name in HISTORIES:
+        worksheets[sheet_name] = workbook.add_worksheet(sheet_name)
+        worksheets[sheet_name].write_row(0, 0, ["date", "moderator"])
+        rows[sheet_name] = 1
+    for sheet_name, df in chunks:
+        worksheet = worksheets[sheet_name]
+        for date, mod in zip(df["date"], df["moderator"]):
+            worksheet.write_datetime(
+                rows[sheet_name],
+                0,
+                dt.datetime.combine(date, dt.time()),
+                date_format,
+            )
+            worksheet.write_string(rows[sheet_name], 1, mod)
+            rows[sheet_name] += 1
+    workbook.close()
+
+
+def write_parquet(path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [("sheet", pa.string()), ("date", pa.date32()), ("moderator", pa.string())]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        for sheet_name, df in chunks:
+            writer.write_table(
+                pa.table(
+                    {
+                        "sheet": [sheet_name] * len(df),
+                        "date": list(df["date"]),
+                        "moderator": list(df["moderator"]),
+                    },
+                    schema=schema,
+                )
+            )
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx, "parquet": write_parquet}
+
+
+def format_of(path):
+    fmt = os.path.splitext(path)[1][1:].lower()
+    if fmt not in READERS:
+        raise ValueError(f"Unknown format of {path!r}, use one of {list(READERS)}")
+    return fmt
+
+
+def main():
+    from scheduler import add_storage_arguments, open_storage
+
+    parser = argparse.ArgumentParser(
+        description="Import histories from csv, xlsx or parquet files, or export them."
+    )
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="the .csv, .xlsx or .parquet file")
+    parser.add_argument(
+        "--sheet",
+        default="standup_history",
+        choices=HISTORIES,
+        help="the history of rows that don't name one",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--add-moderators",
+        action="store_true",
+        help="add unknown moderators to the roster, inactive",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only validate and count"
+    )
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+    if not args.data_dir and not args.container:
+        parser.error("either --data-dir or --container is required")
+    try:
+        fmt = format_of(args.path)
+    except ValueError as error:
+        parser.error(str(error))
+
+    storage = open_storage(args)
+    if args.command == "import":
+        chunks = READERS[fmt](args.path, args.sheet, args.chunk_size)
+        print(
+            import_history(
+                storage,
+                chunks,
+                add_moderators=args.add_moderators,
+                dry_run=args.dry_run,
+            )
+        )
+    else:
+        WRITERS[fmt](args.path, history_chunks(storage))
+
+
+if __name__ == "__main__":
+    main()
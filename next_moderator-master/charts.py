@@ -0,0 +1,48 @@
+import functools
+
+import pandas as pd
+
+from instrument import timed
+
+# the leaderboard bar charts, with the most frequent moderator(s) highlighted.
+# A chart is built and serialized to its vega-lite spec once per distinct leaderboard, the
+# spec is then reused on every rerun that shows the same counts.
+
+HIGHLIGHT_COLOUR = "#FFB000"
+COLOUR = "#072543"
+
+
+@functools.lru_cache(maxsize=64)
+def build_chart_spec(moderators, counts, domain, range):
+    # altair is slow to import and only needed once a leaderboard is shown
+    import altair as alt
+
+    leaderboard_df = pd.DataFrame(
+        {"Moderator": list(moderators), "Number of Moderations": list(counts)}
+    )
+    chart_data = (
+        alt.Chart(leaderboard_df)
+        .mark_bar()
+        .encode(
+            x="Moderator",
+            y=alt.Y("Number of Moderations", axis=alt.Axis(tickMinStep=1)),
+            color=alt.Color(
+                "Moderator",
+                scale=alt.Scale(domain=list(domain), range=list(range)),
+                legend=None,
+            ),
+        )
+    )
+    return chart_data.to_dict()
+
+
+# the vega-lite spec for a leaderboard dataframe (Moderator, Number of Moderations)
+@timed("chart")
+def leaderboard_chart_spec(leaderboard_df):
+    moderators = tuple(leaderboard_df["Moderator"])
+    counts = tuple(int(count) for count in leaderboard_df["Number of Moderations"])
+    top_count = max(counts, default=0)
+    colours = tuple(
+        HIGHLIGHT_COLOUR if count == top_count else COLOUR for count in counts
+    )
+    return build_chart_spec(moderators, counts, moderators, colours)
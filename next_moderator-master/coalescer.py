@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import Future
+
+# saves from parallel sessions are queued here and written by one background thread.
+# Whatever piles up while an upload is running goes out together in the next one, so a burst
+# of concurrent clicks costs one read-modify-write of the data file instead of one each.
+# After close() the thread still writes what was submitted before, then stops.
+
+
+class WriteCoalescer:
+    def __init__(self, storage):
+        self.storage = storage
+        self.pending = []  # (records, future)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(
+            target=self.run, name="write-coalescer", daemon=True
+        )
+        self.thread.start()
+
+    # returns a future with the result of storage.append for the batch the records went out in
+    def submit(self, records):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The write queue was closed")
+            self.pending.append((records, future))
+            self.condition.notify()
+        return future
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, []
+            records = [record for batch_records, _ in batch for record in batch_records]
+            try:
+                result = self.storage.append(records)
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+            else:
+                for _, future in batch:
+                    future.set_result(result)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
@@ -0,0 +1,251 @@
+import datetime as dt
+import random
+import threading
+from collections import deque
+
+# the scheduling logic without the app around it: default dates, the draw itself and the
+# numbers kept up to date with the history. It only needs the standard library, so it imports
+# in milliseconds and can run in worker processes or scripts without streamlit, pandas or any
+# credentials. Histories are passed as dataframes but only read through
+# df["date"] / df["moderator"] with .iloc / .iat, so any object offering that works too.
+
+# ================ #
+#  DATES           #
+# ================ #
+
+# how many of the latest moderators are left out of the next draw
+STANDUP_THRESHOLD = 1
+RETRO_THRESHOLD = 3
+
+
+# standups are on Mondays, Wednesdays and Fridays, this is the next one after `day`
+def next_standup_date(day):
+    days_to_next = {1: 2, 2: 1, 3: 2, 4: 1, 5: 3, 6: 2, 7: 1}
+    return day + dt.timedelta(days=days_to_next[day.isoweekday()])
+
+
+def standup_dates(after, n):
+    dates = []
+    for _ in range(n):
+        after = next_standup_date(after)
+        dates.append(after)
+    return dates
+
+
+# retrospectives keep the cadence of the last one, the first planned one is after `after`
+def retro_dates(last_date, after, n, every_days=14):
+    step = dt.timedelta(days=every_days)
+    next_date = last_date + step
+    if next_date <= after:
+        next_date += step * ((after - next_date) // step + 1)
+    return [next_date + i * step for i in range(n)]
+
+
+# ================ #
+#  SELECTION       #
+# ================ #
+
+
+# the last `threshold` different moderators, newest first. Looking someone up is O(1), and a
+# draw is pushed in O(threshold) instead of scanning the whole history again
+class RecentWindow:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.order = deque()
+        self.members = set()
+
+    # walks back from the newest entry only until `threshold` different moderators were seen
+    @classmethod
+    def from_newest_first(cls, moderators, threshold):
+        window = cls(threshold)
+        for mod in moderators:
+            if len(window.order) >= threshold:
+                break
+            if mod not in window.members:
+                window.members.add(mod)
+                window.order.append(mod)
+        return window
+
+    def push(self, mod):
+        if mod in self.members:
+            self.order.remove(mod)
+        else:
+            self.members.add(mod)
+        self.order.appendleft(mod)
+        if len(self.order) > self.threshold:
+            self.members.discard(self.order.pop())
+
+    def __contains__(self, mod):
+        return mod in self.members
+
+
+# draws from the available moderators that are not in the window, in O(available), either
+# uniformly or with the given weights (anyone without a weight counts as never drawn).
+# If all of them moderated recently there is no one to draw from, so the one who moderated
+# the longest ago is picked instead. Returns (moderator, whether that fallback was used)
+def pick_next_mod(available_team, window, rng=random, weights=None):
+    candidates = [mod for mod in available_team if mod not in window]
+    if candidates and weights is not None:
+        candidate_weights = [weights.get(mod, 1.0) for mod in candidates]
+        return rng.choices(candidates, candidate_weights)[0], False
+    if candidates:
+        return rng.choice(candidates), False
+    order = {mod: i for i, mod in enumerate(window.order)}
+    return max(available_team, key=order.__getitem__), True
+
+
+# draws for the dates one after the other, every draw counts as recent for the following ones.
+# The dates must come after the whole history, so none of the draws replaces one
+def plan_draws(
+    sheet_name,
+    df,
+    dates,
+    roster,
+    threshold,
+    away=None,
+    counters=None,
+    rng=random,
+    archived=(),
+):
+    away = away or {}
+    window = RecentWindow.from_newest_first(df["moderator"].iloc[::-1], threshold)
+    if counters is not None:
+        counters.sync(df, archived)
+    records = []
+    for next_date in dates:
+        available_team = [mod for mod in roster if next_date not in away.get(mod, ())]
+        if not available_team:
+            raise ValueError(f"Nobody is available for the {sheet_name} on {next_date}")
+        weights = counters.weights(next_date) if counters is not None else None
+        next_mod, _ = pick_next_mod(available_team, window, rng, weights)
+        window.push(next_mod)
+        if counters is not None:
+            counters.record(next_date, next_mod)
+        records.append(draw_record(sheet_name, next_date, next_mod))
+    return records
+
+
+# ================ #
+#  HISTORY         #
+# ================ #
+
+
+# replaces is the moderator the drawing session saw for that date (None for a new date)
+def draw_record(sheet_name, next_date, next_mod, replaces=None):
+    return {
+        "op": "draw",
+        "sheet": sheet_name,
+        "date": next_date.isoformat(),
+        "moderator": next_mod,
+        "replaces": replaces,
+    }
+
+
+# the first day after the last archived month in the counts, None without any
+def end_of_archive(archived):
+    if not archived:
+        return None
+    last_month = max(date for date, _, _ in archived)
+    return (last_month.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+
+# base for numbers derived from a history (counts, weights, ...) that are kept up to date draw
+# by draw instead of being recomputed: sync() only adds the history rows it has not seen yet,
+# record() adds a saved draw directly. Subclasses implement reset() and add(date, mod, sign).
+# The months moved to the archive (see archive.py) are passed to sync() as their counts,
+# ((first day of the month, moderator, count), ...), and added like that many draws. Rows of
+# the history before the end of the archive, e.g. while a compaction has written the archive
+# but not yet the smaller data file, are left out, so they are never counted twice.
+class HistoryAggregate:
+    def __init__(self):
+        self.covered = 0  # history rows counted so far
+        self.last_row = None  # (date, moderator) of the last of them
+        self.archived = ()  # the archived counts included
+        self.archived_until = None  # the end of the archived counts
+        self.lock = threading.Lock()
+        self.reset()
+
+    def sync(self, df, archived=()):
+        with self.lock:
+            rows = len(df)
+            if (
+                archived != self.archived
+                or self.covered > rows
+                or (
+                    self.covered
+                    and (
+                        df["date"].iat[self.covered - 1],
+                        df["moderator"].iat[self.covered - 1],
+                    )
+                    != self.last_row
+                )
+            ):
+                # the history was changed by someone else, not only extended, or compacted:
+                # start over
+                self.reset()
+                self.covered = 0
+                self.archived = archived
+                self.archived_until = end_of_archive(archived)
+                for date, mod, count in archived:
+                    self.add(date, mod, count)
+            new_rows = df.iloc[self.covered :]
+            for date, mod in zip(new_rows["date"], new_rows["moderator"]):
+                if self.archived_until is None or date >= self.archived_until:
+                    self.add(date, mod)
+            self.covered = rows
+            if rows:
+                self.last_row = (df["date"].iat[-1], df["moderator"].iat[-1])
+
+    # a saved draw, replaces is the moderator it took the date from (None for a new date)
+    def record(self, date, mod, replaces=None):
+        with self.lock:
+            counted = self.archived_until is None or date >= self.archived_until
+            if replaces is not None:
+                if counted:
+                    self.add(date, replaces, -1)
+                if self.last_row == (date, replaces):
+                    self.last_row = (date, mod)
+            else:
+                self.covered += 1
+                self.last_row = (date, mod)
+            if counted:
+                self.add(date, mod)
+
+
+# time-decayed moderation counts for the weighted draw: every draw counts 1, and its weight
+# halves every `half_life_days`
+class FairnessCounters(HistoryAggregate):
+    def __init__(self, half_life_days=90):
+        self.half_life_days = half_life_days
+        super().__init__()
+
+    def reset(self):
+        # each draw is stored as 2 ** (days since origin / half life), so adding one never
+        # needs to decay everybody else's count first
+        self.scaled = {}
+        self.origin = None
+
+    def contribution(self, date):
+        if self.origin is None:
+            self.origin = date
+        exponent = (date - self.origin).days / self.half_life_days
+        if exponent > 512:
+            # move the origin before the scaled values overflow
+            factor = 2.0**-exponent
+            self.scaled = {mod: value * factor for mod, value in self.scaled.items()}
+            self.origin, exponent = date, 0
+        return 2.0**exponent
+
+    def add(self, date, mod, sign=1):
+        self.scaled[mod] = self.scaled.get(mod, 0.0) + sign * self.contribution(date)
+
+    # moderators who moderated less, and less recently, get a higher weight
+    def weights(self, on_date):
+        with self.lock:
+            if self.origin is None:
+                return {}
+            decay = 2.0 ** -((on_date - self.origin).days / self.half_life_days)
+            return {
+                mod: 1 / (1 + max(value * decay, 0))
+                for mod, value in self.scaled.items()
+            }
@@ -0,0 +1,165 @@
+import hashlib
+import itertools
+import threading
+import types
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+# an in-memory stand-in for the parts of azure.storage.blob the app uses, with the same
+# ETag semantics as the real service. Clients created from the same connection string
+# share their blobs, like clients of the same storage account would.
+#
+#   from fake_blob import FakeBlobServiceClient
+#   files = blob_files.BlobFiles(FakeBlobServiceClient.from_connection_string("local").get_container_client("c"))
+#
+# For tests against the real protocol use the Azurite emulator and its connection string instead.
+
+ACCOUNTS = {}
+ACCOUNTS_LOCK = threading.Lock()
+
+
+class FakeAccount:
+    def __init__(self):
+        self.blobs = {}  # (container, name) -> (etag, data)
+        self.lock = threading.Lock()
+        self.etags = itertools.count(1)
+        self.stats = {
+            "downloads": 0,
+            "not_modified": 0,
+            "downloaded_bytes": 0,
+            "uploads": 0,
+        }
+
+    def new_etag(self, data):
+        return f'"{next(self.etags):x}-{hashlib.md5(data).hexdigest()[:8]}"'
+
+
+def check_condition(current_etag, etag, match_condition):
+    if etag is None or match_condition is None:
+        return
+    if match_condition == MatchConditions.IfNotModified and current_etag != etag:
+        raise ResourceModifiedError(
+            "The condition specified using HTTP conditional header(s) is not met."
+        )
+    if match_condition == MatchConditions.IfModified and current_etag == etag:
+        error = ResourceNotModifiedError(
+            "The condition specified using HTTP conditional header(s) is not met."
+        )
+        error.status_code = 304
+        raise error
+
+
+class FakeDownloader:
+    def __init__(self, data, etag):
+        self.data = data
+        self.properties = types.SimpleNamespace(etag=etag, size=len(data))
+
+    def readall(self):
+        return self.data
+
+
+class FakeBlobClient:
+    def __init__(self, account, container, name):
+        self.account = account
+        self.key = (container, name)
+
+    def current(self):
+        if self.key not in self.account.blobs:
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        return self.account.blobs[self.key]
+
+    def get_blob_properties(self):
+        with self.account.lock:
+            etag, data = self.current()
+        return types.SimpleNamespace(etag=etag, size=len(data))
+
+    def download_blob(self, offset=None, length=None, etag=None, match_condition=None):
+        with self.account.lock:
+            current_etag, data = self.current()
+            try:
+                check_condition(current_etag, etag, match_condition)
+            except ResourceNotModifiedError:
+                self.account.stats["not_modified"] += 1
+                raise
+            start = offset or 0
+            end = len(data) if length is None else start + length
+            self.account.stats["downloads"] += 1
+            self.account.stats["downloaded_bytes"] += end - start
+        return FakeDownloader(data[start:end], current_etag)
+
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None):
+        if hasattr(data, "read"):
+            data = data.read()
+        data = bytes(data)
+        with self.account.lock:
+            if self.key in self.account.blobs:
+                if not overwrite and etag is None:
+                    raise ResourceExistsError("The specified blob already exists.")
+                check_condition(self.account.blobs[self.key][0], etag, match_condition)
+            elif match_condition == MatchConditions.IfNotModified:
+                raise ResourceNotFoundError("The specified blob does not exist.")
+            new_etag = self.account.new_etag(data)
+            self.account.blobs[self.key] = (new_etag, data)
+            self.account.stats["uploads"] += 1
+        return {"etag": new_etag}
+
+    def create_append_blob(self, match_condition=None):
+        if match_condition == MatchConditions.IfMissing:
+            return self.upload_blob(b"", overwrite=False)
+        return self.upload_blob(b"", overwrite=True)
+
+    def append_block(self, data, etag=None, match_condition=None):
+        data = bytes(data)
+        with self.account.lock:
+            current_etag, current = self.current()
+            check_condition(current_etag, etag, match_condition)
+            new_etag = self.account.new_etag(current + data)
+            self.account.blobs[self.key] = (new_etag, current + data)
+        return {"etag": new_etag}
+
+    def delete_blob(self):
+        with self.account.lock:
+            self.current()
+            del self.account.blobs[self.key]
+
+
+class FakeContainerClient:
+    def __init__(self, account, container):
+        self.account = account
+        self.container = container
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self.account, self.container, blob)
+
+    def list_blobs(self, name_starts_with=None):
+        with self.account.lock:
+            names = [
+                name
+                for container, name in self.account.blobs
+                if container == self.container
+                and name.startswith(name_starts_with or "")
+            ]
+        return [types.SimpleNamespace(name=name) for name in sorted(names)]
+
+
+class FakeBlobServiceClient:
+    def __init__(self, account):
+        self.account = account
+
+    @classmethod
+    def from_connection_string(cls, connection_string, **kwargs):
+        with ACCOUNTS_LOCK:
+            account = ACCOUNTS.setdefault(connection_string, FakeAccount())
+        return cls(account)
+
+    def get_container_client(self, container):
+        return FakeContainerClient(self.account, container)
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self.account, container, blob)
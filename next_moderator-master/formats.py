@@ -0,0 +1,114 @@
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from instrument import timed
+from workbook import SHEETS, read_workbook, write_workbook
+
+# the data can be stored as moderators.xlsx, moderators.arrow (Arrow IPC file) or
+# moderators.parquet, the format is picked from the file extension.
+# The columnar formats keep all three sheets in one typed table, told apart by the sheet column:
+#   sheet: moderators | standup_history | retrospective_history
+#   date: date32, empty for the moderators rows
+#   moderator: string
+#   is_active: bool, empty for the history rows
+
+SCHEMA = pa.schema(
+    [
+        ("sheet", pa.dictionary(pa.int8(), pa.string())),
+        ("date", pa.date32()),
+        ("moderator", pa.string()),
+        ("is_active", pa.bool_()),
+    ]
+)
+COLUMNS = {
+    "moderators": ["moderator", "is_active"],
+    "standup_history": ["date", "moderator"],
+    "retrospective_history": ["date", "moderator"],
+}
+
+
+def to_table(frames):
+    df = pd.concat(
+        [df.assign(sheet=sheet_name) for df, sheet_name in zip(frames, SHEETS)],
+        ignore_index=True,
+    )
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def from_table(table):
+    frames = []
+    for sheet_name in SHEETS:
+        part = table.filter(pc.equal(table.column("sheet"), sheet_name))
+        df = part.select(COLUMNS[sheet_name]).to_pandas(date_as_object=True)
+        if "is_active" in df.columns:
+            df["is_active"] = df["is_active"].astype(bool)
+        frames.append(df)
+    return tuple(frames)
+
+
+# data can be bytes or any buffer (e.g. a memory-mapped file), pa.py_buffer wraps it
+# without copying and the ipc reader builds the columns directly on top of it
+def read_arrow(data):
+    return from_table(pa.ipc.open_file(pa.py_buffer(data)).read_all())
+
+
+def write_arrow(frames):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, SCHEMA) as writer:
+        writer.write_table(to_table(frames))
+    return sink.getvalue().to_pybytes()
+
+
+def read_parquet(data):
+    return from_table(pq.read_table(pa.BufferReader(pa.py_buffer(data))))
+
+
+def write_parquet(frames):
+    sink = pa.BufferOutputStream()
+    pq.write_table(to_table(frames), sink)
+    return sink.getvalue().to_pybytes()
+
+
+FORMATS = {
+    "xlsx": (read_workbook, write_workbook),
+    "arrow": (read_arrow, write_arrow),
+    "parquet": (read_parquet, write_parquet),
+}
+
+
+def format_of(file_name):
+    fmt = file_name.rsplit(".", 1)[-1]
+    if fmt not in FORMATS:
+        raise ValueError(
+            f"Unknown data format for {file_name!r}, use one of {list(FORMATS)}"
+        )
+    return fmt
+
+
+@timed("parse")
+def read_frames(data, file_name):
+    read, _ = FORMATS[format_of(file_name)]
+    return read(data)
+
+
+@timed("serialize")
+def write_frames(frames, file_name):
+    _, write = FORMATS[format_of(file_name)]
+    return write(frames)
+
+
+# convert between the formats, e.g. python -m formats moderators.xlsx moderators.arrow
+def convert(source_path, target_path):
+    with open(source_path, "rb") as f:
+        frames = read_frames(f.read(), source_path)
+    with open(target_path, "wb") as f:
+        f.write(write_frames(frames, target_path))
+
+
+if __name__ == "__main__":
+    convert(sys.argv[1], sys.argv[2])
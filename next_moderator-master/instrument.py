@@ -0,0 +1,179 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# opt-in timings of the hot path (file I/O, parsing, selection, charts, ...). Code marks a
+# stage with
+#   with span("io.read"): ...      or      @timed("io.read")
+# which costs one attribute lookup while the recorder is disabled. Enabled, every span is timed
+# and nested under the span it runs in, so each rerun of the app leaves a tree of its stages.
+# The latest durations of every stage are kept for percentiles and can be exported as json or
+# in the Prometheus text format, picked by the file extension (.json or .prom).
+
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.children = []
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "ms": round(self.seconds * 1000, 3),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    # one line per span, indented by depth
+    def lines(self, depth=0):
+        yield f"{'  ' * depth}{self.name} {self.seconds * 1000:.1f}ms"
+        for child in self.children:
+            yield from child.lines(depth + 1)
+
+
+class Recorder:
+    def __init__(self, samples=1000, reruns=20):
+        self.enabled = False
+        self.export_path = None
+        self.samples = samples
+        self.durations = {}  # stage -> deque of the latest durations in seconds
+        self.reruns = deque(maxlen=reruns)  # the latest span trees, newest last
+        self.lock = threading.Lock()
+        self.local = threading.local()  # the open spans of each thread
+
+    def enable(self, export_path=None):
+        self.enabled = True
+        self.export_path = export_path
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def add(self, name, seconds):
+        with self.lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.samples)
+            self.durations[name].append(seconds)
+
+    # a rerun is the root span of its thread, a rerun that was cut short (st.stop, an exception)
+    # is simply replaced by the next one
+    def begin_rerun(self):
+        if self.enabled:
+            self.local.stack = [Span("rerun")]
+            self.local.start = time.perf_counter()
+
+    def end_rerun(self):
+        stack = self.stack()
+        if not self.enabled or not stack:
+            return
+        root = stack[0]
+        root.seconds = time.perf_counter() - self.local.start
+        self.local.stack = []
+        self.add(root.name, root.seconds)
+        with self.lock:
+            self.reruns.append(root)
+        if self.export_path:
+            self.export(self.export_path)
+
+    # p50 and p95 of every stage, over its latest samples
+    def summary(self):
+        with self.lock:
+            durations = {
+                name: sorted(values) for name, values in self.durations.items()
+            }
+        return [
+            {
+                "stage": name,
+                "count": len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "sum_ms": sum(values) * 1000,
+            }
+            for name, values in sorted(durations.items())
+        ]
+
+    def to_json(self):
+        with self.lock:
+            reruns = [root.to_dict() for root in self.reruns]
+        return json.dumps({"stages": self.summary(), "reruns": reruns}, indent=1)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP next_moderator_stage_seconds Duration of the app's stages.",
+            "# TYPE next_moderator_stage_seconds summary",
+        ]
+        for stage in self.summary():
+            labels = f'stage="{stage["stage"]}"'
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                lines.append(
+                    f'next_moderator_stage_seconds{{{labels},quantile="{quantile}"}} '
+                    f"{stage[key] / 1000:.6f}"
+                )
+            lines.append(
+                f"next_moderator_stage_seconds_sum{{{labels}}} {stage['sum_ms'] / 1000:.6f}"
+            )
+            lines.append(
+                f"next_moderator_stage_seconds_count{{{labels}}} {stage['count']}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        data = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        # replace the file at once, so a scraper never reads half of it
+        with open(path + ".tmp", "w") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+
+# nearest-rank percentile of sorted values
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    rank = max(int(-(-len(values) * percent // 100)), 1)
+    return values[rank - 1]
+
+
+RECORDER = Recorder()
+
+
+class span:
+    def __init__(self, name, recorder=RECORDER):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        if self.recorder.enabled:
+            self.span = Span(self.name)
+            stack = self.recorder.stack()
+            if stack:
+                stack[-1].children.append(self.span)
+            stack.append(self.span)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.recorder.enabled and hasattr(self, "span"):
+            self.span.seconds = time.perf_counter() - self.start
+            stack = self.recorder.stack()
+            if stack and stack[-1] is self.span:
+                stack.pop()
+            self.recorder.add(self.name, self.span.seconds)
+        return False
+
+
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not RECORDER.enabled:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
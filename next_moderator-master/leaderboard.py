@@ -0,0 +1,170 @@
+import datetime as dt
+import json
+import sys
+
+import pandas as pd
+
+from core import HistoryAggregate, end_of_archive
+
+# number of moderations per moderator per month, so the leaderboards never have to merge and
+# group the whole history. It is stored next to the data file as <name>.leaderboard.json and
+# kept in step with every draw; check() rebuilds it from the raw history to verify it.
+
+
+def month_of(date):
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+class LeaderboardIndex(HistoryAggregate):
+    def reset(self):
+        self.months = {}  # "YYYY-MM" -> {moderator: count}
+        self.totals = {}  # moderator -> count
+
+    def add(self, date, mod, sign=1):
+        month = self.months.setdefault(month_of(date), {})
+        month[mod] = month.get(mod, 0) + sign
+        self.totals[mod] = self.totals.get(mod, 0) + sign
+
+    @classmethod
+    def from_history(cls, df, archived=()):
+        index = cls()
+        index.sync(df, archived)
+        return index
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "covered": self.covered,
+                "last_row": (
+                    [self.last_row[0].isoformat(), self.last_row[1]]
+                    if self.last_row
+                    else None
+                ),
+                "months": self.months,
+                "archived": [
+                    [date.isoformat(), mod, count] for date, mod, count in self.archived
+                ],
+            }
+        ).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls()
+        stored = json.loads(data)
+        index.covered = stored["covered"]
+        if stored["last_row"]:
+            last_date, last_mod = stored["last_row"]
+            index.last_row = (dt.date.fromisoformat(last_date), last_mod)
+        index.months = stored["months"]
+        index.archived = tuple(
+            (dt.date.fromisoformat(date), mod, count)
+            for date, mod, count in stored.get("archived", ())
+        )
+        index.archived_until = end_of_archive(index.archived)
+        for counts in index.months.values():
+            for mod, count in counts.items():
+                index.totals[mod] = index.totals.get(mod, 0) + count
+        return index
+
+    # differences to an index rebuilt from the raw history, as (month, moderator, stored, actual)
+    def check(self, df, archived=()):
+        rebuilt = LeaderboardIndex.from_history(df, archived)
+        differences = []
+        for month in sorted(set(self.months) | set(rebuilt.months)):
+            stored = self.months.get(month, {})
+            actual = rebuilt.months.get(month, {})
+            for mod in sorted(set(stored) | set(actual)):
+                if stored.get(mod, 0) != actual.get(mod, 0):
+                    differences.append(
+                        (month, mod, stored.get(mod, 0), actual.get(mod, 0))
+                    )
+        return differences
+
+    # the counts of the month `today` is in, for the draws before `before`
+    def this_month(self, df, today, before):
+        with self.lock:
+            counts = dict(self.months.get(month_of(today), {}))
+        # the draws of this month on or after `before`, wherever they are: a date picked out of
+        # order is saved after newer ones
+        next_month = (today.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+        dates = df["date"]
+        later = (dates >= before) & (dates < next_month)
+        for mod in df["moderator"][later.to_numpy(bool)]:
+            counts[mod] = counts.get(mod, 0) - 1
+        return to_leaderboard(counts)
+
+    # all-time counts of the active moderators, without the newest active draw
+    def all_time(self, df, active_mods):
+        with self.lock:
+            counts = {mod: self.totals.get(mod, 0) for mod in active_mods}
+        for mod in df["moderator"].iloc[::-1]:
+            if mod in counts:
+                counts[mod] -= 1
+                break
+        return to_leaderboard(counts)
+
+
+# a leaderboard dataframe, like grouping the history by moderator would give
+def to_leaderboard(counts):
+    counts = {mod: count for mod, count in counts.items() if count > 0}
+    return pd.DataFrame(
+        {
+            "Moderator": sorted(counts),
+            "Number of Moderations": [counts[mod] for mod in sorted(counts)],
+        }
+    )
+
+
+# the newest `n` draws before `before`, newest first
+def previous_draws(df, before, n=8):
+    rows = []
+    for date, mod in zip(df["date"].iloc[::-1], df["moderator"].iloc[::-1]):
+        if date < before:
+            rows.append((date, mod))
+            if len(rows) == n:
+                break
+    return pd.DataFrame(rows, columns=["Date", "Moderator"])
+
+
+def index_name(file_name):
+    return file_name.rsplit(".", 1)[0] + ".leaderboard.json"
+
+
+# the stored index, sync() it with the history before use: if it no longer matches, it is
+# rebuilt from the history once
+def read_index(files, file_name):
+    data = files.read(index_name(file_name))
+    return LeaderboardIndex.from_json(data) if data else LeaderboardIndex()
+
+
+def save_index(files, file_name, index):
+    with index.lock:
+        data = index.to_json()
+    files.write(index_name(file_name), data)
+
+
+# verify a local index against its data file (and its archive, if it was compacted):
+# python -m leaderboard moderators.xlsx
+if __name__ == "__main__":
+    import os
+
+    from archive import read_archive
+    from formats import read_frames
+    from storage import LocalFiles
+
+    file_name = sys.argv[1]
+    with open(file_name, "rb") as f:
+        _, standup_df, _ = read_frames(f.read(), file_name)
+    if not os.path.exists(index_name(file_name)):
+        print(f"There is no {index_name(file_name)} yet, nothing to check")
+        sys.exit(0)
+    with open(index_name(file_name), "rb") as f:
+        index = LeaderboardIndex.from_json(f.read())
+    archive = read_archive(
+        LocalFiles(os.path.dirname(os.path.abspath(file_name))),
+        os.path.basename(file_name),
+    )
+    differences = index.check(standup_df, archive.counts("standup_history"))
+    for difference in differences:
+        print("month {} {}: stored {}, actual {}".format(*difference))
+    sys.exit(1 if differences else 0)
@@ -1,12 +1,25 @@
-import random
 import base64
-import pandas as pd
-import numpy as np
+import os
+import re
 import streamlit as st
 import datetime as dt
-import altair as alt
-from azure.storage.blob import BlobServiceClient
-import io
+from archive import read_archive
+from charts import leaderboard_chart_spec
+from core import (
+    RETRO_THRESHOLD,
+    STANDUP_THRESHOLD,
+    FairnessCounters,
+    RecentWindow,
+    draw_record,
+    next_standup_date,
+    pick_next_mod,
+)
+from instrument import RECORDER, span, timed
+from leaderboard import previous_draws, read_index, save_index
+from records import add_next_mod, apply_records, mod_on, roster_patch_record
+from storage import EventLogStorage, LocalFiles, SnapshotStorage, shard_prefix
+from teams import TeamResources
+from wal import WriteAheadQueue
 
 # ================= #
 #  AZURE FUNCTIONS  #
@@ -17,32 +30,68 @@ import io
 connection_string = st.secrets.blob_credentials.connection_string
 container_name = st.secrets.blob_credentials.container_name
 
-
-def read_from_blob_storage(file_name):
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    blob_client = blob_service_client.get_blob_client(
-        container=container_name, blob=file_name
+# optional [settings] section of the secrets
+#   storage_backend = "snapshot" (default) rewrites moderators.xlsx on every save,
+#                     "event_log" appends every change to moderators.log.jsonl
+#   snapshot_every = 50, records in the event log between two moderators.xlsx snapshots
+#   data_file = "moderators.xlsx" (default), "moderators.arrow" or "moderators.parquet",
+#               convert an existing file with python -m formats moderators.xlsx moderators.arrow
+#   data_dir = "...", keep the files in a local directory instead of the blob container
+#   blob_pool_size = 10, connections kept open to the blob service
+#   refresh_seconds = 30, how often other servers' saves are looked for in the background
+#   cache_ttl = 3600, seconds a loaded version of the archived counts stays cached
+#   cached_data = 64, versions of the archived counts kept in memory, one per active team
+#   max_teams = 64, teams whose storage, version watcher, write queue and parsed data are kept
+#               in memory, the data once per team for all its sessions. Beyond that the least
+#               recently used team is dropped, its threads are stopped and its data released
+#   live_refresh_seconds = 5, how often a session checks whether someone else saved, 0: never
+#   write_ahead_dir = "...", save without waiting for the upload: saves are written to a
+#                     local file in this directory and uploaded in the background, with
+#                     retries, and whatever was not uploaded yet is uploaded after a restart.
+#                     One directory per server process, on a disk that outlives it
+#   instrumentation = false, time the stages of every rerun, shown on the diagnostics page
+#                     (add ?diagnostics to the URL) and exported to
+#                     metrics_file = "metrics.json" or "metrics.prom" (Prometheus text format)
+#   draw_mode = { standup = "random", retrospective = "weighted" }, "weighted" pre-selects the
+#               Fair Draw, which favours whoever moderated less, with counts that halve
+#               every fairness_half_life_days = 90
+settings = st.secrets.get("settings", {})
+if settings.get("instrumentation"):
+    RECORDER.enable(settings.get("metrics_file"))
+
+# several teams can share one deployment: with ?team=<name> in the URL a session works on that
+# team's own shard, teams/<name>/ in the blob container (or in data_dir). Every shard is only
+# loaded once a session asks for it, and is cached separately. Without the parameter the files
+# at the root are used, as before. A new team's shard starts with uploading its moderators.xlsx.
+TEAM_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+MAX_TEAMS = settings.get("max_teams", 64)
+
+
+# one blob client and connection pool shared by every session and rerun
+@st.cache_resource
+def get_container_client():
+    # the azure sdk is only imported when the data is kept in a blob container
+    from blob_files import connect_blob_container
+
+    return connect_blob_container(
+        connection_string, container_name, settings.get("blob_pool_size", 10)
     )
-    downloaded_blob = blob_client.download_blob().readall()
-    return downloaded_blob
 
 
-def prepare_xlsx_for_upload(tuples_list):
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine="xlsxwriter")
-    for x in tuples_list:
-        x[0].to_excel(writer, sheet_name=x[1], index=False)
-    writer.close()
-    return output.getvalue()
-
+# the storage of a team's shard, nothing is read or created before it is used
+def make_storage(team):
+    if settings.get("data_dir"):
+        files = LocalFiles(os.path.join(settings["data_dir"], shard_prefix(team)))
+    else:
+        from blob_files import BlobFiles
 
-def upload_to_blob_storage(tuples_list, file_name):
-    file_path = prepare_xlsx_for_upload(tuples_list)
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    blob_client = blob_service_client.get_blob_client(
-        container=container_name, blob=file_name
-    )
-    blob_client.upload_blob(file_path, overwrite=True)
+        files = BlobFiles(get_container_client(), shard_prefix(team))
+    file_name = settings.get("data_file", "moderators.xlsx")
+    if settings.get("storage_backend", "snapshot") == "event_log":
+        return EventLogStorage(
+            files, file_name, snapshot_every=settings.get("snapshot_every", 50)
+        )
+    return SnapshotStorage(files, file_name)
 
 
 # ===================== #
@@ -50,38 +99,148 @@ def upload_to_blob_storage(tuples_list, file_name):
 # ===================== #
 
 
-# get list of previous moderators
-@st.cache_data  # to only run this function once at the beginning instead of with every click
-def get_data():
-    blob_file = read_from_blob_storage("moderators.xlsx")
+# the team from the URL, None without one
+def get_team():
+    team = st.query_params.get("team")
+    if team is not None and not TEAM_NAME.fullmatch(team):
+        st.error("A team name can only contain letters, digits, - and _")
+        st.stop()
+    return team
+
 
-    moderators_df = pd.read_excel(blob_file, sheet_name="moderators")
-    standup_df = pd.read_excel(blob_file, sheet_name="standup_history")
-    retro_df = pd.read_excel(blob_file, sheet_name="retrospective_history")
+# whether the team's shard has a data file, checked before anything is kept for the team, so
+# a made-up team name costs one lookup and leaves nothing behind
+@st.cache_data(ttl=settings.get("refresh_seconds", 30), max_entries=MAX_TEAMS)
+def has_data(team):
+    return make_storage(team).version() is not None
 
-    standup_df["date"] = pd.to_datetime(standup_df["date"], format="%Y-%m-%d").dt.date
-    retro_df["date"] = pd.to_datetime(retro_df["date"], format="%Y-%m-%d").dt.date
-    return moderators_df, standup_df, retro_df
+
+# shared by all sessions of a team: the storage keeps state between reruns (e.g. the event
+# log's tail length and the ETag cache of the blob files), the watcher the current version of
+# the stored data
+@st.cache_resource(
+    max_entries=MAX_TEAMS, on_release=lambda team_resources: team_resources.close()
+)
+def get_team_resources(team):
+    write_ahead_path = None
+    if settings.get("write_ahead_dir"):
+        write_ahead_path = os.path.join(
+            settings["write_ahead_dir"], shard_prefix(team), "pending.jsonl"
+        )
+    return TeamResources(
+        make_storage(team), settings.get("refresh_seconds", 30), write_ahead_path
+    )
 
 
-# randomize the next moderator
-def get_next_mod(df, available_team, threshold):
-    prev_mod = df.unique().tolist()[:threshold]
-    next_mod = random.choice(available_team)
-    while next_mod in prev_mod:
-        next_mod = random.choice(available_team)
-    return next_mod
+def get_storage(team):
+    return get_team_resources(team).storage
 
 
-# add the next moderator to the previous moderators list
-def add_next_mod(df, next_mod, next_date):
-    insert_row = {
-        "date": next_date,
-        "moderator": next_mod,
-    }
-    df = pd.concat([df, pd.DataFrame([insert_row])], ignore_index=True)
-    standup_df["date"] = pd.to_datetime(standup_df["date"], format="%Y-%m-%d").dt.date
-    return df
+def get_version_watcher(team):
+    return get_team_resources(team).version_watcher
+
+
+# get list of previous moderators
+# one parsed copy per team for all sessions, every new version (a save of this process, or
+# one the watcher found) is loaded once in the background and the sessions switch over to it
+def get_state_store(team):
+    return get_team_resources(team).state_store
+
+
+def get_write_coalescer(team):
+    return get_team_resources(team).write_queue
+
+
+# persist the records, returns the stored frames after the save (None if not known).
+# With a write-ahead queue it only waits for the local file, the upload follows: the frames
+# are the current data with every pending save applied in order, these records included, so
+# a draw queued first by another session for the same date is the one that is kept.
+# The session shows its own save right away, so the version it creates is no news to it
+@timed("save")
+def save_records(team, records):
+    write_queue = get_write_coalescer(team)
+    future = write_queue.submit(records)
+    version_watcher = get_version_watcher(team)
+    if isinstance(write_queue, WriteAheadQueue):
+        st.session_state["own_upload"] = future
+        return get_current_data(
+            team, version_watcher.version, version_watcher.roster_version
+        )
+    saved_data = future.result()
+    version_watcher.refresh()
+    st.session_state["shown_version"] = (
+        version_watcher.version,
+        version_watcher.roster_version,
+    )
+    return saved_data
+
+
+# the per-month counts of the archived part of the histories (python -m archive compact),
+# they only change together with the data file
+@st.cache_data(
+    ttl=settings.get("cache_ttl", 3600), max_entries=settings.get("cached_data", 64)
+)
+def get_archive(team, version):
+    storage = get_storage(team)
+    return read_archive(storage.files, storage.file_name)
+
+
+# the stored data with the saves that are not uploaded yet on top. A change of the roster
+# shard only reloads the roster
+def get_current_data(team, version, roster_version):
+    frames = get_state_store(team).get(version, roster_version)
+    write_queue = get_write_coalescer(team)
+    if isinstance(write_queue, WriteAheadQueue):
+        pending_records = write_queue.pending_records()
+        if pending_records:
+            frames = apply_records(frames, pending_records)
+    return frames
+
+
+# tells a session that someone saved since the data it shows was loaded: checked every few
+# seconds against the versions the store holds, without asking the storage
+@st.fragment(run_every=settings.get("live_refresh_seconds", 5) or None)
+def new_data_notice(team):
+    own_upload = st.session_state.get("own_upload")
+    if own_upload is not None and own_upload.done():
+        # the version the upload of the session's own save created, the store loads it
+        # before the upload counts as done
+        st.session_state["shown_version"] = get_state_store(team).version
+        del st.session_state["own_upload"]
+    shown_version = st.session_state.get("shown_version")
+    if shown_version is not None and get_state_store(team).version != shown_version:
+        if st.button("🔄 Something was saved in the meantime, show it"):
+            st.rerun()
+
+
+# the standup leaderboards' counts per moderator and month, shared by all sessions
+@st.cache_resource(max_entries=MAX_TEAMS)
+def get_leaderboard_index(team):
+    storage = get_storage(team)
+    return read_index(storage.files, storage.file_name)
+
+
+# count a saved standup draw in the leaderboards and store the updated counts
+@timed("leaderboard.save")
+def record_leaderboard_draw(team, next_date, next_mod, previous_mod):
+    storage = get_storage(team)
+    leaderboard_index = get_leaderboard_index(team)
+    leaderboard_index.record(next_date, next_mod, previous_mod)
+    save_index(storage.files, storage.file_name, leaderboard_index)
+
+
+# per-moderator counts of one history for the fair draw, shared by all sessions
+@st.cache_resource(max_entries=2 * MAX_TEAMS)
+def get_fairness_counters(team, sheet_name):
+    return FairnessCounters(settings.get("fairness_half_life_days", 90))
+
+
+# randomize the next moderator, df holds the previous moderators newest first
+# returns the moderator and whether everyone available was among the last `threshold`
+@timed("select")
+def get_next_mod(df, available_team, threshold, weights=None):
+    recent_mods = RecentWindow.from_newest_first(df.to_numpy(), threshold)
+    return pick_next_mod(available_team, recent_mods, weights=weights)
 
 
 # =============== #
@@ -91,6 +250,7 @@ def add_next_mod(df, next_mod, next_date):
 
 # set the page title, icon, and layout
 st.set_page_config(page_title="Next Moderator", page_icon="📣", layout="wide")
+RECORDER.begin_rerun()
 
 # this aligns all buttons to the center of the container
 customized_button = st.markdown(
@@ -126,11 +286,28 @@ col1, col2, col3 = st.columns([1, 3, 1])
 with col3:
     selectbox_page = st.selectbox(
         "",
-        ["☀️ Standups", "🪩 Retrospectives", "😎 Moderators"],
+        ["☀️ Standups", "🪩 Retrospectives", "😎 Moderators"]
+        + (["🩺 Diagnostics"] if "diagnostics" in st.query_params else []),
         label_visibility="collapsed",
     )
 
-moderators_df, standup_df, retro_df = get_data()
+team = get_team()
+version_watcher = get_version_watcher(team) if has_data(team) else None
+version = version_watcher.version if version_watcher else None
+if version is None:
+    st.info(
+        f"There is no data for the team {team} yet."
+        if team
+        else "There is no data yet."
+    )
+    st.stop()
+with span("load"):
+    moderators_df, standup_df, retro_df = get_current_data(
+        team, version, version_watcher.roster_version
+    )
+# what this rerun shows, the notice compares it with the newest version
+st.session_state["shown_version"] = (version, version_watcher.roster_version)
+new_data_notice(team)
 
 if selectbox_page == "☀️ Standups":
     moderators = moderators_df["moderator"][moderators_df["is_active"] == True].tolist()
@@ -175,12 +352,7 @@ if selectbox_page == "☀️ Standups":
             unsafe_allow_html=True,
         )
     else:
-        if today.isoweekday() in [1, 2]:
-            next_date_default = today + dt.timedelta(days=(3 - today.isoweekday()))
-        elif today.isoweekday() in [3, 4]:
-            next_date_default = today + dt.timedelta(days=(5 - today.isoweekday()))
-        elif today.isoweekday() == 5:
-            next_date_default = today + dt.timedelta(days=3)
+        next_date_default = next_standup_date(today)
 
         if today == last_date:
             top_label = "Today"
@@ -209,14 +381,15 @@ if selectbox_page == "☀️ Standups":
             button_next_mod = st.button(label="Get Lucky!")
         with col3:
             checkbox_save = st.checkbox("Save Results", True)
+            checkbox_fair = st.checkbox(
+                "Fair Draw",
+                settings.get("draw_mode", {}).get("standup") == "weighted",
+            )
 
         st.write("")
 
         # if button is clicked, get the next moderator and show some stats
         if button_next_mod:
-            # clear cache at the beginning of the instance
-            st.cache_data.clear()
-
             # some fool proofing
             if len(available_team) < 1:
                 st.markdown(
@@ -237,31 +410,69 @@ if selectbox_page == "☀️ Standups":
                     unsafe_allow_html=True,
                 )
             else:
+                # who this session sees for that date, a concurrent draw for it must not be overwritten
+                previous_mod = mod_on(standup_df, next_date)
+                archived_counts = get_archive(team, version).counts("standup_history")
+                get_leaderboard_index(team).sync(standup_df, archived_counts)
+                weights = None
+                if checkbox_fair:
+                    fairness_counters = get_fairness_counters(team, "standup_history")
+                    fairness_counters.sync(standup_df, archived_counts)
+                    weights = fairness_counters.weights(next_date)
                 if last_date == next_date:
                     standup_df = standup_df[standup_df["date"] < next_date]
-                    next_mod = get_next_mod(
-                        standup_df["moderator"][::-1], available_team, 1
+                    next_mod, everyone_recent = get_next_mod(
+                        standup_df["moderator"][::-1],
+                        available_team,
+                        STANDUP_THRESHOLD,
+                        weights,
                     )
                     if checkbox_save:
                         standup_df = add_next_mod(standup_df, next_mod, next_date)
-                        save_data = [
-                            (moderators_df, "moderators"),
-                            (standup_df, "standup_history"),
-                            (retro_df, "retrospective_history"),
-                        ]
-                        upload_to_blob_storage(save_data, "moderators.xlsx")
+                        saved_data = save_records(
+                            team,
+                            [
+                                draw_record(
+                                    "standup_history", next_date, next_mod, previous_mod
+                                )
+                            ],
+                        )
                 else:
-                    next_mod = get_next_mod(
-                        standup_df["moderator"][::-1], available_team, 1
+                    next_mod, everyone_recent = get_next_mod(
+                        standup_df["moderator"][::-1],
+                        available_team,
+                        STANDUP_THRESHOLD,
+                        weights,
                     )
                     if checkbox_save:
                         standup_df = add_next_mod(standup_df, next_mod, next_date)
-                        save_data = [
-                            (moderators_df, "moderators"),
-                            (standup_df, "standup_history"),
-                            (retro_df, "retrospective_history"),
-                        ]
-                        upload_to_blob_storage(save_data, "moderators.xlsx")
+                        saved_data = save_records(
+                            team,
+                            [
+                                draw_record(
+                                    "standup_history", next_date, next_mod, previous_mod
+                                )
+                            ],
+                        )
+
+                # if someone else drew for the same date at the same time, their draw was kept
+                # and counted where it was drawn (sync picks up the draws of other servers)
+                own_draw = True
+                if checkbox_save and saved_data is not None:
+                    moderators_df, standup_df, retro_df = saved_data
+                    if mod_on(standup_df, next_date) != next_mod:
+                        next_mod = mod_on(standup_df, next_date)
+                        own_draw = False
+                        st.markdown(
+                            "<p style='text-align: center; font-size: 20px;'>🏎️ Someone else was faster, this is the moderator they drew 🏎️</p>",
+                            unsafe_allow_html=True,
+                        )
+
+                # keep the fair draw's and the leaderboards' counts in step with the saved draw
+                if checkbox_save and checkbox_fair and own_draw:
+                    fairness_counters.record(next_date, next_mod, previous_mod)
+                if checkbox_save and own_draw:
+                    record_leaderboard_draw(team, next_date, next_mod, previous_mod)
 
                 st.markdown(
                     f"<p style='text-align: center; font-size: 25px; color: #FFB000'><b>{next_date} Stand-Up's Moderator</b></p>",
@@ -271,14 +482,15 @@ if selectbox_page == "☀️ Standups":
                     f"<p style='text-align: center; font-size: 75px; color: #072543'><b>{next_mod}</b></p>",
                     unsafe_allow_html=True,
                 )
+                if everyone_recent:
+                    st.markdown(
+                        "<p style='text-align: center; font-size: 20px;'>🔁 Everyone available moderated recently, so it's whoever did it the longest ago 🔁</p>",
+                        unsafe_allow_html=True,
+                    )
                 st.write("")
 
-                standup_plot_df = pd.merge(
-                    standup_df, moderators_df, how="left", on="moderator"
-                )
-                standup_plot_df.rename(
-                    columns={"date": "Date", "moderator": "Moderator"}, inplace=True
-                )
+                # the leaderboards read the precomputed counts instead of grouping the history
+                leaderboard_index = get_leaderboard_index(team)
 
                 col1, col2, col3 = st.columns([2, 1, 2])
                 # current month's leaderboard
@@ -287,53 +499,20 @@ if selectbox_page == "☀️ Standups":
                         f"<p style='text-align: center; font-size: 20px; color: #072543'><b>This Month's Leaderboard</b></p>",
                         unsafe_allow_html=True,
                     )
-                    leaderboard_this_month_df = standup_plot_df[
-                        (standup_plot_df["Date"] >= dt.date(today.year, today.month, 1))
-                        & (standup_plot_df["Date"] < next_date_default)
-                    ]
-                    leaderboard_this_month_df = leaderboard_this_month_df.groupby(
-                        "Moderator", as_index=False
-                    ).count()
-                    leaderboard_this_month_df.rename(
-                        columns={"Date": "Number of Moderations"}, inplace=True
-                    )
-                    leaderboard_this_month_df["Colour"] = np.where(
-                        leaderboard_this_month_df["Number of Moderations"]
-                        == leaderboard_this_month_df["Number of Moderations"].max(),
-                        "#FFB000",
-                        "#072543",
+                    leaderboard_this_month_df = leaderboard_index.this_month(
+                        standup_df, today, next_date_default
                     )
-                    domain = leaderboard_this_month_df["Moderator"].tolist()
-                    range = leaderboard_this_month_df["Colour"].tolist()
-                    chart_data = (
-                        alt.Chart(leaderboard_this_month_df)
-                        .mark_bar()
-                        .encode(
-                            x="Moderator",
-                            y=alt.Y(
-                                "Number of Moderations", axis=alt.Axis(tickMinStep=1)
-                            ),
-                            color=alt.Color(
-                                "Moderator",
-                                scale=alt.Scale(domain=domain, range=range),
-                                legend=None,
-                            ),
-                        )
+                    st.vega_lite_chart(
+                        spec=leaderboard_chart_spec(leaderboard_this_month_df),
+                        use_container_width=True,
                     )
-                    st.altair_chart(chart_data, use_container_width=True)
                 # recent moderators table
                 with col2:
                     st.markdown(
                         f"<p style='text-align: center; font-size: 20px; color: #072543'><b>Previous moderators</b></p>",
                         unsafe_allow_html=True,
                     )
-                    standup_display_df = (
-                        standup_plot_df[standup_plot_df["Date"] < next_date_default][
-                            ["Date", "Moderator"]
-                        ]
-                        .iloc[::-1]
-                        .head(8)
-                    )
+                    standup_display_df = previous_draws(standup_df, next_date_default)
                     st.markdown(hide_table_row_index, unsafe_allow_html=True)
                     st.table(standup_display_df)
                 # overall leaderboard
@@ -342,38 +521,13 @@ if selectbox_page == "☀️ Standups":
                         f"<p style='text-align: center; font-size: 20px; color: #072543'><b>All Time Leaderboard</b></p>",
                         unsafe_allow_html=True,
                     )
-                    leaderboard_all_time_df = (
-                        standup_plot_df[standup_plot_df["is_active"] == True][:-1]
-                        .groupby("Moderator", as_index=False)
-                        .count()
+                    leaderboard_all_time_df = leaderboard_index.all_time(
+                        standup_df, moderators
                     )
-                    leaderboard_all_time_df.rename(
-                        columns={"Date": "Number of Moderations"}, inplace=True
+                    st.vega_lite_chart(
+                        spec=leaderboard_chart_spec(leaderboard_all_time_df),
+                        use_container_width=True,
                     )
-                    leaderboard_all_time_df["Colour"] = np.where(
-                        leaderboard_all_time_df["Number of Moderations"]
-                        == leaderboard_all_time_df["Number of Moderations"].max(),
-                        "#FFB000",
-                        "#072543",
-                    )
-                    domain = leaderboard_all_time_df["Moderator"].tolist()
-                    range = leaderboard_all_time_df["Colour"].tolist()
-                    chart_data = (
-                        alt.Chart(leaderboard_all_time_df)
-                        .mark_bar()
-                        .encode(
-                            x="Moderator",
-                            y=alt.Y(
-                                "Number of Moderations", axis=alt.Axis(tickMinStep=1)
-                            ),
-                            color=alt.Color(
-                                "Moderator",
-                                scale=alt.Scale(domain=domain, range=range),
-                                legend=None,
-                            ),
-                        )
-                    )
-                    st.altair_chart(chart_data, use_container_width=True)
 
 elif selectbox_page == "🪩 Retrospectives":
     moderators = moderators_df["moderator"][moderators_df["is_active"] == True].tolist()
@@ -445,14 +599,15 @@ elif selectbox_page == "🪩 Retrospectives":
             button_next_mod = st.button(label="Get Lucky!")
         with col3:
             checkbox_save = st.checkbox("Save Results", True)
+            checkbox_fair = st.checkbox(
+                "Fair Draw",
+                settings.get("draw_mode", {}).get("retrospective") == "weighted",
+            )
 
         st.write("")
 
         # if button is clicked, get the next moderator and show some stats
         if button_next_mod:
-            # clear cache at the beginning of the instance
-            st.cache_data.clear()
-
             # some fool proofing
             if len(available_team) < 1:
                 st.markdown(
@@ -473,31 +628,76 @@ elif selectbox_page == "🪩 Retrospectives":
                     unsafe_allow_html=True,
                 )
             else:
+                # who this session sees for that date, a concurrent draw for it must not be overwritten
+                previous_mod = mod_on(retro_df, next_date)
+                weights = None
+                if checkbox_fair:
+                    fairness_counters = get_fairness_counters(
+                        team, "retrospective_history"
+                    )
+                    fairness_counters.sync(
+                        retro_df,
+                        get_archive(team, version).counts("retrospective_history"),
+                    )
+                    weights = fairness_counters.weights(next_date)
                 if last_date == next_date:
                     retro_df = retro_df[retro_df["date"] < next_date]
-                    next_mod = get_next_mod(
-                        retro_df["moderator"][::-1], available_team, 3
+                    next_mod, everyone_recent = get_next_mod(
+                        retro_df["moderator"][::-1],
+                        available_team,
+                        RETRO_THRESHOLD,
+                        weights,
                     )
                     if checkbox_save:
                         retro_df = add_next_mod(retro_df, next_mod, next_date)
-                        save_data = [
-                            (moderators_df, "moderators"),
-                            (standup_df, "standup_history"),
-                            (retro_df, "retrospective_history"),
-                        ]
-                        upload_to_blob_storage(save_data, "moderators.xlsx")
+                        saved_data = save_records(
+                            team,
+                            [
+                                draw_record(
+                                    "retrospective_history",
+                                    next_date,
+                                    next_mod,
+                                    previous_mod,
+                                )
+                            ],
+                        )
                 else:
-                    next_mod = get_next_mod(
-                        retro_df["moderator"][::-1], available_team, 3
+                    next_mod, everyone_recent = get_next_mod(
+                        retro_df["moderator"][::-1],
+                        available_team,
+                        RETRO_THRESHOLD,
+                        weights,
                     )
                     if checkbox_save:
                         retro_df = add_next_mod(retro_df, next_mod, next_date)
-                        save_data = [
-                            (moderators_df, "moderators"),
-                            (standup_df, "standup_history"),
-                            (retro_df, "retrospective_history"),
-                        ]
-                        upload_to_blob_storage(save_data, "moderators.xlsx")
+                        saved_data = save_records(
+                            team,
+                            [
+                                draw_record(
+                                    "retrospective_history",
+                                    next_date,
+                                    next_mod,
+                                    previous_mod,
+                                )
+                            ],
+                        )
+
+                # if someone else drew for the same date at the same time, their draw was kept
+                # and counted where it was drawn (sync picks up the draws of other servers)
+                own_draw = True
+                if checkbox_save and saved_data is not None:
+                    moderators_df, standup_df, retro_df = saved_data
+                    if mod_on(retro_df, next_date) != next_mod:
+                        next_mod = mod_on(retro_df, next_date)
+                        own_draw = False
+                        st.markdown(
+                            "<p style='text-align: center; font-size: 20px;'>🏎️ Someone else was faster, this is the moderator they drew 🏎️</p>",
+                            unsafe_allow_html=True,
+                        )
+
+                # keep the fair draw's counts in step with the saved draw
+                if checkbox_save and checkbox_fair and own_draw:
+                    fairness_counters.record(next_date, next_mod, previous_mod)
 
                 st.markdown(
                     f"<p style='text-align: center; font-size: 25px; color: #FFB000'><b>{next_date} Retrospective's Moderator</b></p>",
@@ -507,6 +707,11 @@ elif selectbox_page == "🪩 Retrospectives":
                     f"<p style='text-align: center; font-size: 75px; color: #072543'><b>{next_mod}</b></p>",
                     unsafe_allow_html=True,
                 )
+                if everyone_recent:
+                    st.markdown(
+                        "<p style='text-align: center; font-size: 20px;'>🔁 Everyone available moderated recently, so it's whoever did it the longest ago 🔁</p>",
+                        unsafe_allow_html=True,
+                    )
 
 elif selectbox_page == "😎 Moderators":
     st.markdown(
@@ -530,26 +735,72 @@ elif selectbox_page == "😎 Moderators":
         description,
         unsafe_allow_html=True,
     )
-    edited_df = st.data_editor(
+    # a new editor for every version of the roster, so edits never apply to an outdated one
+    roster_editor = f"roster_editor-{version_watcher.roster_version}"
+    st.data_editor(
         moderators_df.rename(
             columns={"moderator": "Moderator", "is_active": "isActive"}
         ),
         num_rows="dynamic",
+        key=roster_editor,
     )
     button_save = st.button("Save")
     if button_save:
-        moderators_df = edited_df.rename(
-            columns={"Moderator": "moderator", "isActive": "is_active"}
+        # only the rows that were edited, added or deleted are saved
+        columns = {"Moderator": "moderator", "isActive": "is_active"}
+        editor_state = st.session_state.get(roster_editor, {})
+        roster_patch = roster_patch_record(
+            moderators_df,
+            {
+                "edited_rows": {
+                    position: {columns.get(k, k): v for k, v in edits.items()}
+                    for position, edits in editor_state.get("edited_rows", {}).items()
+                },
+                "added_rows": [
+                    {columns.get(k, k): v for k, v in row.items()}
+                    for row in editor_state.get("added_rows", [])
+                ],
+                "deleted_rows": editor_state.get("deleted_rows", []),
+            },
         )
-        moderators_df.sort_values("moderator", inplace=True, ignore_index=True)
-        save_data = [
-            (moderators_df, "moderators"),
-            (standup_df, "standup_history"),
-            (retro_df, "retrospective_history"),
-        ]
-        upload_to_blob_storage(save_data, "moderators.xlsx")
+        if roster_patch is None:
+            st.markdown(
+                "<p style='text-align: center; font-size: 20px;'>🤷 Nothing has changed 🤷</p>",
+                unsafe_allow_html=True,
+            )
+        else:
+            save_records(team, [roster_patch])
+            st.markdown(
+                "<p style='text-align: center; font-size: 20px;'>🙌 Moderators have been saved! 🙌</p>",
+                unsafe_allow_html=True,
+            )
+
+elif selectbox_page == "🩺 Diagnostics":
+    if not RECORDER.enabled:
+        st.info(
+            "Set instrumentation = true in the [settings] of the secrets to time the app's stages."
+        )
+    else:
         st.markdown(
-            "<p style='text-align: center; font-size: 20px;'>🙌 Moderators have been saved! 🙌</p>",
+            "<p style='text-align: center; font-size: 20px; color: #072543'><b>Latency per Stage</b></p>",
             unsafe_allow_html=True,
         )
-        st.cache_data.clear()
+        st.table(
+            [
+                {
+                    "Stage": stage["stage"],
+                    "Count": stage["count"],
+                    "p50 (ms)": f"{stage['p50_ms']:.1f}",
+                    "p95 (ms)": f"{stage['p95_ms']:.1f}",
+                }
+                for stage in RECORDER.summary()
+            ]
+        )
+        if RECORDER.reruns:
+            st.markdown(
+                "<p style='text-align: center; font-size: 20px; color: #072543'><b>Last Rerun</b></p>",
+                unsafe_allow_html=True,
+            )
+            st.code("\n".join(RECORDER.reruns[-1].lines()))
+
+RECORDER.end_rerun()
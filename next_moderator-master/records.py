@@ -0,0 +1,155 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from workbook import SHEETS
+
+# every change to the data is described by a record, a small json-serializable dict:
+#   {"op": "draw", "sheet": "standup_history", "date": "2024-05-06", "moderator": "...",
+#    "replaces": "..."}
+#   {"op": "roster", "moderators": [{"moderator": "...", "is_active": true}, ...]}
+#   {"op": "roster_patch", "remove": ["..."], "upsert": [{"moderator": "...", "is_active": true}]}
+# records are idempotent, so replaying one that is already part of the data changes nothing
+
+
+# the moderator stored for a date, or None
+def mod_on(df, next_date):
+    matches = df["moderator"][df["date"] == next_date]
+    return matches.iloc[-1] if len(matches) else None
+
+
+def roster_record(moderators_df):
+    return {
+        "op": "roster",
+        "moderators": [
+            {"moderator": row.moderator, "is_active": bool(row.is_active)}
+            for row in moderators_df[["moderator", "is_active"]].itertuples(index=False)
+        ],
+    }
+
+
+# only what was changed in a roster, from the edits of st.data_editor on moderators_df:
+# changes = {"edited_rows": {position: {column: value}}, "added_rows": [{column: value}],
+#            "deleted_rows": [position]} with the columns moderator and is_active.
+# Returns None when nothing changed. A renamed moderator is removed and added again
+def roster_patch_record(moderators_df, changes):
+    deleted = {int(position) for position in changes.get("deleted_rows", [])}
+    remove = [moderators_df["moderator"].iat[position] for position in sorted(deleted)]
+    upsert = {}
+    for position, edits in changes.get("edited_rows", {}).items():
+        position = int(position)
+        if position in deleted:
+            continue
+        mod = moderators_df["moderator"].iat[position]
+        new_mod = edits.get("moderator", mod)
+        if new_mod != mod:
+            remove.append(mod)
+        if new_mod:
+            upsert[new_mod] = bool(
+                edits.get("is_active", moderators_df["is_active"].iat[position])
+            )
+    for row in changes.get("added_rows", []):
+        if row.get("moderator"):
+            upsert[row["moderator"]] = bool(row.get("is_active"))
+    if not remove and not upsert:
+        return None
+    return {
+        "op": "roster_patch",
+        "remove": remove,
+        "upsert": [
+            {"moderator": mod, "is_active": is_active}
+            for mod, is_active in upsert.items()
+        ],
+    }
+
+
+def is_roster_record(record):
+    return record["op"] in ("roster", "roster_patch")
+
+
+# the roster after a roster or roster_patch record, sorted by moderator
+def apply_roster(moderators_df, record):
+    if record["op"] == "roster":
+        moderators = record["moderators"]
+    else:
+        roster = dict(zip(moderators_df["moderator"], moderators_df["is_active"]))
+        for mod in record["remove"]:
+            roster.pop(mod, None)
+        for row in record["upsert"]:
+            roster[row["moderator"]] = row["is_active"]
+        moderators = [
+            {"moderator": mod, "is_active": bool(is_active)}
+            for mod, is_active in sorted(roster.items())
+        ]
+    return pd.DataFrame(moderators, columns=["moderator", "is_active"]).astype(
+        {"is_active": bool}
+    )
+
+
+# a draw for a date that is already in the history replaces that moderator in place,
+# any other draw is appended at the end. A draw only applies on top of what its session saw:
+# if someone else drew for the same date in the meantime, the first draw stays.
+# This runs on every save and every rerun with pending saves, so the history is only scanned
+# once for the dates of the draws and only copied when a stored draw is replaced
+def apply_draws(df, draws):
+    if not draws:
+        return df
+    draw_dates = {next_date for next_date, _, _ in draws}
+    matches = np.flatnonzero(df["date"].isin(draw_dates).to_numpy())
+    positions = {df["date"].iat[position]: position for position in matches}
+    replaced = {}
+    new_rows = {}
+    for next_date, next_mod, replaces in draws:
+        if next_date in new_rows:
+            if new_rows[next_date] == replaces:
+                new_rows[next_date] = next_mod
+        elif next_date in positions:
+            position = positions[next_date]
+            if replaced.get(position, df["moderator"].iat[position]) == replaces:
+                replaced[position] = next_mod
+        elif replaces is None:
+            new_rows[next_date] = next_mod
+    if replaced:
+        df = df.copy()
+        column = df.columns.get_loc("moderator")
+        for position, next_mod in replaced.items():
+            df.iat[position, column] = next_mod
+    if new_rows:
+        insert_df = pd.DataFrame(
+            {"date": list(new_rows), "moderator": list(new_rows.values())}
+        )
+        df = pd.concat([df, insert_df], ignore_index=True)
+    return df
+
+
+# add the next moderator to the previous moderators list
+def add_next_mod(df, next_mod, next_date):
+    insert_row = {
+        "date": next_date,
+        "moderator": next_mod,
+    }
+    return pd.concat([df, pd.DataFrame([insert_row])], ignore_index=True)
+
+
+# apply a batch of records to (moderators_df, standup_df, retro_df) and return the new frames
+def apply_records(frames, records):
+    frames = dict(zip(SHEETS, frames))
+    draws = {sheet_name: [] for sheet_name in SHEETS[1:]}
+    for record in records:
+        if record["op"] == "draw":
+            draws[record["sheet"]].append(
+                (
+                    dt.date.fromisoformat(record["date"]),
+                    record["moderator"],
+                    record.get("replaces"),
+                )
+            )
+        elif is_roster_record(record):
+            # draws recorded before a roster change are kept, only the roster is replaced
+            frames["moderators"] = apply_roster(frames["moderators"], record)
+        else:
+            raise ValueError(f"Unknown record op {record['op']!r}")
+    for sheet_name, sheet_draws in draws.items():
+        frames[sheet_name] = apply_draws(frames[sheet_name], sheet_draws)
+    return tuple(frames[sheet_name] for sheet_name in SHEETS)
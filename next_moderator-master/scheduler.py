@@ -0,0 +1,147 @@
+import argparse
+import datetime as dt
+import json
+import os
+import random
+
+from core import (
+    RETRO_THRESHOLD,
+    STANDUP_THRESHOLD,
+    FairnessCounters,
+    plan_draws,
+    retro_dates,
+    standup_dates,
+)
+
+# plans the moderators of many upcoming standups and retrospectives in one go, without
+# streamlit. The draws follow the same rules as "Get Lucky!" and the whole plan is saved with a
+# single storage.append:
+#   records = schedule(storage, standups=40, retros=6)
+# or from the command line, here for a local data directory:
+#   python -m scheduler --data-dir data --standups 40 --retros 6 --away away.json
+# away.json lists the dates someone is not available: {"Ana": ["2026-11-02", "2026-11-04"]}
+
+
+# the records for the next `standups` standups and `retros` retrospectives after `today`
+# (and after the newest draws already made). away maps a moderator to the dates they are off,
+# fair draws with the weights of the Fair Draw checkbox, which count the archived months of a
+# compacted history (an archive.Archive) as well
+def plan(
+    frames,
+    standups=0,
+    retros=0,
+    today=None,
+    away=None,
+    fair=False,
+    half_life_days=90,
+    retro_every_days=14,
+    rng=random,
+    archive=None,
+):
+    moderators_df, standup_df, retro_df = frames
+    roster = moderators_df["moderator"][moderators_df["is_active"] == True].tolist()
+    today = today or dt.date.today()
+    away = {mod: set(dates) for mod, dates in (away or {}).items()}
+
+    last_standup = standup_df["date"].iloc[-1] if len(standup_df) else today
+    last_retro = retro_df["date"].iloc[-1] if len(retro_df) else today
+    return plan_draws(
+        "standup_history",
+        standup_df,
+        standup_dates(max(today, last_standup), standups),
+        roster,
+        STANDUP_THRESHOLD,
+        away,
+        FairnessCounters(half_life_days) if fair else None,
+        rng,
+        archive.counts("standup_history") if archive else (),
+    ) + plan_draws(
+        "retrospective_history",
+        retro_df,
+        retro_dates(last_retro, max(today, last_retro), retros, retro_every_days),
+        roster,
+        RETRO_THRESHOLD,
+        away,
+        FairnessCounters(half_life_days) if fair else None,
+        rng,
+        archive.counts("retrospective_history") if archive else (),
+    )
+
+
+# plans and saves the draws with one write, returns their records
+def schedule(storage, standups=0, retros=0, **options):
+    from archive import read_archive
+
+    archive = read_archive(storage.files, storage.file_name)
+    records = plan(storage.load(), standups, retros, archive=archive, **options)
+    if records:
+        storage.append(records)
+    return records
+
+
+# the options open_storage() reads, shared with the other command line tools
+def add_storage_arguments(parser):
+    parser.add_argument("--data-dir", help="local data directory instead of azure")
+    parser.add_argument(
+        "--container", help="blob container, AZURE_STORAGE_CONNECTION_STRING is used"
+    )
+    parser.add_argument("--team")
+    parser.add_argument("--data-file", default="moderators.xlsx")
+    parser.add_argument("--event-log", action="store_true")
+
+
+# the storage modules pull in pandas and the azure sdk, planning itself needs neither
+def open_storage(args):
+    from storage import EventLogStorage, LocalFiles, SnapshotStorage, shard_prefix
+
+    if args.data_dir:
+        files = LocalFiles(os.path.join(args.data_dir, shard_prefix(args.team)))
+    else:
+        from blob_files import BlobFiles, connect_blob_container
+
+        container_client = connect_blob_container(
+            os.environ["AZURE_STORAGE_CONNECTION_STRING"], args.container
+        )
+        files = BlobFiles(container_client, shard_prefix(args.team))
+    if args.event_log:
+        return EventLogStorage(files, args.data_file)
+    return SnapshotStorage(files, args.data_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Draw the moderators of the upcoming standups and retrospectives."
+    )
+    parser.add_argument("--standups", type=int, default=0)
+    parser.add_argument("--retros", type=int, default=0)
+    parser.add_argument("--away", help="json file with the dates people are off")
+    parser.add_argument("--fair", action="store_true", help="use the fair draw")
+    parser.add_argument("--retro-every-days", type=int, default=14)
+    add_storage_arguments(parser)
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan")
+    args = parser.parse_args()
+    if not args.data_dir and not args.container:
+        parser.error("either --data-dir or --container is required")
+
+    away = {}
+    if args.away:
+        with open(args.away) as f:
+            away = {
+                mod: [dt.date.fromisoformat(day) for day in days]
+                for mod, days in json.load(f).items()
+            }
+    storage = open_storage(args)
+    options = dict(away=away, fair=args.fair, retro_every_days=args.retro_every_days)
+    if args.dry_run:
+        from archive import read_archive
+
+        options["archive"] = read_archive(storage.files, storage.file_name)
+        records = plan(storage.load(), args.standups, args.retros, **options)
+    else:
+        records = schedule(storage, args.standups, args.retros, **options)
+    for record in records:
+        print(record["date"], record["sheet"], record["moderator"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# replays many years of draws for many random seeds at once, to compare thresholds (how many
+# of the latest moderators are left out of the next draw) with numbers instead of guesses.
+# Every seed is one team drawing over and over with the rules of core.pick_next_mod; a step of
+# the simulation draws for all seeds in a few numpy operations instead of a python loop each.
+#   python -m simulate --team-size 12 --years 1000 --seeds 1000 --thresholds 0 1 2 3
+# Seeds are simulated in chunks of `chunk_size` with their own random streams, so the results
+# only depend on `seed`, never on how many worker processes shared the work.
+
+
+# one chunk of seeds for one threshold, returns per-seed arrays of the numbers reported
+def simulate_chunk(seed_sequence, seeds, team_size, threshold, draws, absence_rate):
+    rng = np.random.default_rng(seed_sequence)
+    rows = np.arange(seeds)
+    window_size = min(threshold, team_size)
+    # every seed keeps its team in one row: the recent window first, newest first, then
+    # everyone who can be drawn in no particular order. Before the first draw everyone
+    # moderated once in that order, so the window starts out full like on a real history
+    order = rng.permuted(np.tile(np.arange(team_size), (seeds, 1)), axis=1)
+    last_turn = np.empty((seeds, team_size), dtype=np.int64)
+    last_turn[rows[:, None], order] = -1 - np.arange(team_size)
+    previous = order[:, 0].copy()
+    shift = np.arange(1, window_size)
+    counts = np.zeros((seeds, team_size), dtype=np.int64)
+    max_gap = np.zeros(seeds, dtype=np.int64)
+    back_to_back = np.zeros(seeds, dtype=np.int64)
+    fallbacks = np.zeros(seeds, dtype=np.int64)
+    for step in range(draws):
+        if absence_rate:
+            # who is there, by place in the row: everyone is off with the same chance, so
+            # there is no need to look up who is in which place
+            available = rng.random((seeds, team_size)) >= absence_rate
+            # nobody there: the draw happens anyway, with everyone
+            available[~available.any(axis=1)] = True
+        else:
+            available = None
+        if window_size == team_size:
+            position = np.zeros(seeds, dtype=np.int64)
+            fallback = np.ones(seeds, dtype=bool)
+        elif available is None:
+            position = rng.integers(window_size, team_size, seeds)
+            fallback = None
+        else:
+            # a uniform choice among the available: the one with the highest random key
+            keys = rng.random((seeds, team_size - window_size))
+            keys[~available[:, window_size:]] = -1.0
+            position = window_size + keys.argmax(axis=1)
+            fallback = ~available[:, window_size:].any(axis=1)
+        if fallback is not None and fallback.any():
+            # like pick_next_mod: the available moderator in the window who moderated the
+            # longest ago, the window is newest first
+            in_window = (
+                available[:, :window_size]
+                if available is not None
+                else np.ones((seeds, window_size), dtype=bool)
+            )
+            oldest = window_size - 1 - in_window[:, ::-1].argmax(axis=1)
+            position = np.where(fallback, oldest, position)
+            fallbacks += fallback
+        choice = order[rows, position]
+
+        # the choice moves to the front of the window, everyone in front of its old place
+        # moves back one. When it was not in the window, the oldest one drops out into its place
+        leaving = order[:, window_size - 1].copy() if window_size else None
+        if window_size:
+            window = order[:, :window_size]
+            window[:, 1:] = np.where(
+                shift <= position[:, None], window[:, :-1], window[:, 1:]
+            )
+            window[:, 0] = choice
+            outside = position >= window_size
+            order[rows[outside], position[outside]] = leaving[outside]
+
+        max_gap = np.maximum(max_gap, step - last_turn[rows, choice])
+        back_to_back += choice == previous
+        last_turn[rows, choice] = step
+        counts[rows, choice] += 1
+        previous = choice
+    return counts.var(axis=1), max_gap, back_to_back, fallbacks
+
+
+def run_chunk(args):
+    return args[0], simulate_chunk(*args[1:])
+
+
+# returns {threshold: {"count_variance", "max_gap_mean", "max_gap", "back_to_back_rate",
+# "fallback_rate"}}, every threshold is run on the same seeds
+def simulate(
+    team_size,
+    thresholds=(0, 1, 2, 3),
+    years=100,
+    seeds=1000,
+    draws_per_year=156,
+    absence_rate=0.0,
+    workers=1,
+    seed=0,
+    chunk_size=250,
+):
+    draws = years * draws_per_year
+    chunk_sizes = [
+        min(chunk_size, seeds - start) for start in range(0, seeds, chunk_size)
+    ]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [
+        (threshold, seed_sequence, size, team_size, threshold, draws, absence_rate)
+        for threshold in thresholds
+        for seed_sequence, size in zip(seed_sequences, chunk_sizes)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(run_chunk, tasks))
+    else:
+        results = [run_chunk(task) for task in tasks]
+
+    report = {}
+    for threshold in thresholds:
+        variance, max_gap, back_to_back, fallbacks = (
+            np.concatenate(column)
+            for column in zip(*(chunk for t, chunk in results if t == threshold))
+        )
+        report[threshold] = {
+            "count_variance": variance.mean(),
+            "max_gap_mean": max_gap.mean(),
+            "max_gap": max_gap.max(),
+            "back_to_back_rate": back_to_back.sum() / (seeds * draws),
+            "fallback_rate": fallbacks.sum() / (seeds * draws),
+        }
+    return report
+
+
+def print_report(report):
+    print(
+        f"{'threshold':>9} {'count var':>10} {'max gap':>8} {'worst gap':>9} "
+        f"{'back-to-back':>12} {'fallback':>9}"
+    )
+    for threshold, numbers in report.items():
+        print(
+            f"{threshold:>9} {numbers['count_variance']:>10.1f} "
+            f"{numbers['max_gap_mean']:>8.1f} {numbers['max_gap']:>9} "
+            f"{numbers['back_to_back_rate']:>12.2%} {numbers['fallback_rate']:>9.2%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare draw thresholds on simulated moderator histories."
+    )
+    parser.add_argument("--team-size", type=int, default=12)
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--years", type=int, default=100)
+    parser.add_argument("--seeds", type=int, default=1000)
+    parser.add_argument(
+        "--draws-per-year", type=int, default=156, help="156 standups, 26 retros"
+    )
+    parser.add_argument(
+        "--absence-rate", type=float, default=0.0, help="chance someone is off"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print_report(
+        simulate(
+            args.team_size,
+            args.thresholds,
+            args.years,
+            args.seeds,
+            args.draws_per_year,
+            args.absence_rate,
+            args.workers,
+            args.seed,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
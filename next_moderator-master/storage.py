@@ -0,0 +1,350 @@
+import io
+import json
+import mmap
+import os
+import random
+import threading
+import time
+
+from archive import full_frames
+from formats import read_frames, write_frames
+from instrument import timed
+from records import apply_records, apply_roster, is_roster_record, roster_record
+from workbook import write_workbook
+
+# ================ #
+#  FILE ACCESS     #
+# ================ #
+
+# LocalFiles and BlobFiles (in blob_files.py, so the azure sdk is only imported where a blob
+# container is used) expose the same small interface, so every storage backend works on
+# a blob container as well as on a local directory:
+#   read(name, offset=0) -> bytes, or None if the file does not exist
+#   read_versioned(name) -> (bytes, etag), or (None, None) if the file does not exist
+#   etag(name) -> the current etag without reading the file, None if it does not exist
+#   write(name, data) -> the new etag
+#   write_if_unchanged(name, data, etag) -> the new etag, raises WriteConflict if the file is
+#                                           no longer at that etag (etag None: if the file
+#                                           exists by now)
+#   append(name, data)
+#   map(name) -> a read-only buffer with the file's content, memory-mapped where possible
+
+
+class WriteConflict(Exception):
+    pass
+
+
+class LocalFiles:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    @timed("io.read")
+    def read(self, name, offset=0):
+        try:
+            with open(self.path(name), "rb") as f:
+                f.seek(offset)
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # every write replaces the file, so inode, mtime and size together identify a version
+    @timed("io.etag")
+    def etag(self, name):
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    @timed("io.read_versioned")
+    def read_versioned(self, name):
+        with self.lock:
+            return self.read(name), self.etag(name)
+
+    # the columnar formats read straight from the mapped pages instead of a copy in memory
+    @timed("io.map")
+    def map(self, name):
+        with open(self.path(name), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @timed("io.write")
+    def write(self, name, data):
+        # write to a temporary file first, so readers never see half a file
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        tmp_path = self.path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(name))
+        return self.etag(name)
+
+    # only guards against writers in this process, which is all a local directory is used for
+    @timed("io.write_if_unchanged")
+    def write_if_unchanged(self, name, data, etag):
+        with self.lock:
+            if self.etag(name) != etag:
+                raise WriteConflict(name)
+            return self.write(name, data)
+
+    @timed("io.append")
+    def append(self, name, data):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# the optimistic write every storage uses: attempt() reads the file's current version and
+# applies the change to it, returning (data to write, etag it was read at, result). The data
+# is written with If-Match on that etag. When someone else wrote in between, the write is
+# refused and attempted again on top of their version. Returns (result, new etag)
+def write_optimistically(files, name, attempt, max_attempts=10):
+    for attempt_number in range(max_attempts):
+        data, etag, result = attempt()
+        try:
+            return result, files.write_if_unchanged(name, data, etag)
+        except WriteConflict:
+            # back off a little, with jitter so the writers don't collide again
+            time.sleep(random.uniform(0, 0.01 * 2**attempt_number))
+    raise WriteConflict(f"{name} kept changing, gave up after {max_attempts} attempts")
+
+
+# where a team's files are kept, under teams/<team>/ (team None: at the root)
+def shard_prefix(team):
+    return "" if team is None else f"teams/{team}/"
+
+
+# ================ #
+#  STORAGE         #
+# ================ #
+
+# a storage loads (moderators_df, standup_df, retro_df) and persists records:
+#   load() -> frames
+#   version() -> a string that changes whenever the stored data changes, None if there is
+#                no data file yet
+#   append(records) -> the stored frames after the records, or None if that is not known
+#   update(change) -> rewrites the data file with change(frames), retried on top of the
+#                     latest version when someone else saved in between, returns the result
+#   export() -> the whole data as moderators.xlsx bytes, the archived months included
+#   roster -> the RosterShard the roster records are saved to
+# the data file can be any of the formats in formats.py, picked by its extension.
+# The parsed data file is kept with its etag, so loading a version again, or the version this
+# process just wrote, costs an etag check instead of a download and a parse. The loaded frames
+# are shared, they must not be modified
+
+
+# the roster is kept in a small file of its own next to the data file, <name>.roster.json,
+# so changing it never rewrites the histories and only the roster has to be loaded again.
+# Until the first roster change the moderators sheet of the data file is the roster, after it
+# the shard replaces that sheet in every load. Writes are optimistic like the data file's.
+class RosterShard:
+    def __init__(self, files, file_name, max_attempts=10):
+        self.files = files
+        self.name = file_name.rsplit(".", 1)[0] + ".roster.json"
+        self.max_attempts = max_attempts
+
+    def version(self):
+        return self.files.etag(self.name)
+
+    # the stored roster, None if it was never changed
+    def load(self):
+        data = self.files.read(self.name)
+        return apply_roster(None, json.loads(data)) if data else None
+
+    # frames with the stored roster, or with moderators_df when it is already known
+    def overlay(self, frames, moderators_df=None):
+        if moderators_df is None:
+            moderators_df = self.load()
+        return frames if moderators_df is None else (moderators_df,) + tuple(frames[1:])
+
+    # applies roster records, load_roster() gives the roster before the first change.
+    # Returns the new roster
+    @timed("storage.roster")
+    def append(self, records, load_roster):
+        def attempt():
+            data, etag = self.files.read_versioned(self.name)
+            moderators_df = (
+                apply_roster(None, json.loads(data)) if data else load_roster()
+            )
+            for record in records:
+                moderators_df = apply_roster(moderators_df, record)
+            data = json.dumps(roster_record(moderators_df)).encode("utf-8")
+            return data, etag, moderators_df
+
+        moderators_df, _ = write_optimistically(
+            self.files, self.name, attempt, self.max_attempts
+        )
+        return moderators_df
+
+
+def split_roster_records(records):
+    return [record for record in records if is_roster_record(record)], [
+        record for record in records if not is_roster_record(record)
+    ]
+
+
+# the original layout: the whole data file is rewritten on every change.
+# Saves are optimistic: the records are applied to the current file and written back with
+# If-Match on its etag. When someone else saved in between, the write is refused and
+# repeated on top of their version, so no draw is ever lost to a stale copy.
+class SnapshotStorage:
+    def __init__(self, files, file_name="moderators.xlsx", max_attempts=10):
+        self.files = files
+        self.file_name = file_name
+        self.max_attempts = max_attempts
+        self.roster = RosterShard(files, file_name, max_attempts)
+        self.parsed = (None, None)  # (etag, frames) of the data file
+
+    # the etag is taken before the file is read: if it changes in between, the frames are
+    # newer than their etag and are only parsed again with the next version
+    @timed("storage.load")
+    def load(self):
+        etag = self.files.etag(self.file_name)
+        cached_etag, frames = self.parsed
+        if etag is None or etag != cached_etag:
+            frames = read_frames(self.files.map(self.file_name), self.file_name)
+            self.parsed = (etag, frames)
+        return self.roster.overlay(frames)
+
+    def version(self):
+        return self.files.etag(self.file_name)
+
+    # roster records only touch the roster shard
+    @timed("storage.append")
+    def append(self, records):
+        roster_records, records = split_roster_records(records)
+        moderators_df = (
+            self.roster.append(roster_records, lambda: self.load()[0])
+            if roster_records
+            else None
+        )
+        if not records:
+            return None
+        frames = self.update(lambda frames: apply_records(frames, records))
+        return self.roster.overlay(frames, moderators_df)
+
+    def update(self, change):
+        def attempt():
+            data, etag = self.files.read_versioned(self.file_name)
+            frames = change(read_frames(data, self.file_name))
+            return write_frames(frames, self.file_name), etag, frames
+
+        frames, etag = write_optimistically(
+            self.files, self.file_name, attempt, self.max_attempts
+        )
+        self.parsed = (etag, frames)
+        return frames
+
+    def export(self):
+        return write_workbook(full_frames(self))
+
+
+# every change is appended to a json lines log, so a draw costs the same however long the
+# history is. The state is the last snapshot of the data file plus the log written after it.
+# Every `snapshot_every` records a new snapshot is written and the log offset it covers is
+# stored next to it, so a load never replays more than that many records.
+class EventLogStorage:
+    def __init__(
+        self,
+        files,
+        file_name="moderators.xlsx",
+        log_name="moderators.log.jsonl",
+        snapshot_every=50,
+    ):
+        self.files = files
+        self.file_name = file_name
+        self.log_name = log_name
+        self.offset_name = log_name + ".offset"
+        self.snapshot_every = snapshot_every
+        self.tail_length = 0
+        self.roster = RosterShard(files, file_name)
+        self.parsed = (None, None)  # (etag, frames) of the snapshot
+
+    def read_offset(self):
+        data = self.files.read(self.offset_name)
+        return json.loads(data)["offset"] if data else 0
+
+    # returns the frames, the log size they include and the etag of the snapshot
+    def read_state(self):
+        offset = self.read_offset()
+        data, etag = self.files.read_versioned(self.file_name)
+        cached_etag, frames = self.parsed
+        if etag is None or etag != cached_etag:
+            frames = read_frames(data, self.file_name)
+            self.parsed = (etag, frames)
+        tail = self.files.read(self.log_name, offset) or b""
+        # only whole lines count, a line can be half written while we read
+        tail = tail[: tail.rfind(b"\n") + 1]
+        records = [json.loads(line) for line in io.BytesIO(tail) if line.strip()]
+        self.tail_length = len(records)
+        return apply_records(frames, records), offset + len(tail), etag
+
+    @timed("storage.load")
+    def load(self):
+        frames, _, _ = self.read_state()
+        return self.roster.overlay(frames)
+
+    def version(self):
+        data_etag = self.files.etag(self.file_name)
+        if data_etag is None:
+            return None
+        return f"{data_etag}/{self.files.etag(self.log_name)}"
+
+    # the log only grows, the state after the records is read back from it: a concurrent draw
+    # for the same date that was appended first is the one that is kept.
+    # Roster records go to the roster shard instead
+    @timed("storage.append")
+    def append(self, records):
+        roster_records, records = split_roster_records(records)
+        moderators_df = (
+            self.roster.append(roster_records, lambda: self.load()[0])
+            if roster_records
+            else None
+        )
+        if not records:
+            return None
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        self.files.append(self.log_name, data.encode("utf-8"))
+        self.tail_length += len(records)
+        if self.tail_length >= self.snapshot_every:
+            self.snapshot()
+        frames, _, _ = self.read_state()
+        return self.roster.overlay(frames, moderators_df)
+
+    # the snapshot is written before its offset, and records are idempotent, so a crash in
+    # between only means a few records get replayed twice. If another process wrote a
+    # snapshot since we read ours, theirs wins and this one is dropped.
+    @timed("storage.snapshot")
+    def snapshot(self):
+        frames, offset, etag = self.read_state()
+        try:
+            etag = self.files.write_if_unchanged(
+                self.file_name, write_frames(frames, self.file_name), etag
+            )
+        except WriteConflict:
+            return
+        self.parsed = (etag, frames)
+        self.files.write(self.offset_name, json.dumps({"offset": offset}).encode())
+        self.tail_length = 0
+
+    # like a snapshot, but a conflicting snapshot is not good enough: repeated on top of it
+    def update(self, change, max_attempts=10):
+        def attempt():
+            frames, offset, etag = self.read_state()
+            frames = change(frames)
+            return write_frames(frames, self.file_name), etag, (frames, offset)
+
+        (frames, offset), etag = write_optimistically(
+            self.files, self.file_name, attempt, max_attempts
+        )
+        self.parsed = (etag, frames)
+        self.files.write(self.offset_name, json.dumps({"offset": offset}).encode())
+        self.tail_length = 0
+        return frames
+
+    def export(self):
+        return write_workbook(full_frames(self))
@@ -0,0 +1,52 @@
+import threading
+
+# the parsed roster and histories of one team, held once for the whole process. Every session
+# reads the same frames (st.cache_data would hand each of them its own copy), and when many
+# sessions ask for a new version at once, e.g. right before the standup, only the first one
+# loads it while the others wait for its result. The VersionWatcher publishes every new
+# version to the store, so it is usually loaded in the background before a session asks.
+# The frames are shared: they must not be modified, changes are saved as records.
+
+
+class StateStore:
+    def __init__(self, storage):
+        self.storage = storage
+        self.condition = threading.Condition()
+        self.version = None  # (version, roster_version) of the frames
+        self.frames = None
+        self.loading = False
+
+    # the frames of the given versions of the data and of the roster shard
+    def get(self, version, roster_version):
+        key = (version, roster_version)
+        with self.condition:
+            while self.loading and self.version != key:
+                self.condition.wait()
+            if self.version == key:
+                return self.frames
+            self.loading = True
+            previous_version, frames = self.version, self.frames
+        try:
+            moderators_df = None
+            if previous_version is not None and previous_version[0] == version:
+                # only the roster changed, the histories stay
+                moderators_df = self.storage.roster.load()
+            if moderators_df is not None:
+                frames = (moderators_df,) + tuple(frames[1:])
+            else:
+                # the version is read before the data, so the frames are at least that new
+                frames = self.storage.load()
+        except BaseException:
+            with self.condition:
+                self.loading = False
+                self.condition.notify_all()
+            raise
+        with self.condition:
+            self.version, self.frames = key, frames
+            self.loading = False
+            self.condition.notify_all()
+        return frames
+
+    # subscribed to the VersionWatcher
+    def publish(self, version, roster_version):
+        self.get(version, roster_version)
@@ -0,0 +1,29 @@
+from coalescer import WriteCoalescer
+from store import StateStore
+from wal import WriteAheadQueue
+from watcher import VersionWatcher
+
+# what the app keeps for one team while its sessions use it: the storage, the version watcher,
+# the parsed data in a state store and the write queue. The watcher and the queue both run a
+# thread. They are created and dropped together, so a team's watcher, store and queue always
+# work on the same storage, the store gets every version the watcher finds, and close() stops
+# the threads of a team that was dropped. Its parsed data goes with it.
+
+
+class TeamResources:
+    def __init__(self, storage, refresh_seconds=30, write_ahead_path=None):
+        self.storage = storage
+        self.version_watcher = VersionWatcher(storage, refresh_seconds)
+        self.state_store = StateStore(storage)
+        self.version_watcher.subscribers.append(self.state_store.publish)
+        # saves of all sessions go through one queue, so concurrent clicks are uploaded together
+        if write_ahead_path:
+            self.write_queue = WriteAheadQueue(
+                storage, write_ahead_path, on_flush=self.version_watcher.refresh
+            )
+        else:
+            self.write_queue = WriteCoalescer(storage)
+
+    def close(self):
+        self.version_watcher.close()
+        self.write_queue.close()
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from records import apply_roster, roster_patch_record
+
+# the roster_patch records made from the edits of st.data_editor, applied back to the roster
+# usage: python -m pytest tests, or python -m tests.test_roster
+
+ROSTER = pd.DataFrame(
+    {"moderator": ["Ana", "Ben", "Cid"], "is_active": [True, False, True]}
+)
+
+
+def roster_after(changes):
+    record = roster_patch_record(ROSTER, changes)
+    return record, apply_roster(ROSTER, record)
+
+
+def as_dict(moderators_df):
+    return dict(zip(moderators_df["moderator"], moderators_df["is_active"]))
+
+
+def test_rename_removes_the_old_name():
+    record, moderators_df = roster_after({"edited_rows": {1: {"moderator": "Bea"}}})
+    assert record["remove"] == ["Ben"]
+    assert record["upsert"] == [{"moderator": "Bea", "is_active": False}]
+    assert as_dict(moderators_df) == {"Ana": True, "Bea": False, "Cid": True}
+    assert list(moderators_df["moderator"]) == ["Ana", "Bea", "Cid"]
+
+
+def test_edit_of_a_deleted_row_is_dropped():
+    record, moderators_df = roster_after(
+        {
+            "deleted_rows": [0],
+            "edited_rows": {0: {"is_active": False}, 2: {"is_active": False}},
+        }
+    )
+    assert record["remove"] == ["Ana"]
+    assert record["upsert"] == [{"moderator": "Cid", "is_active": False}]
+    assert as_dict(moderators_df) == {"Ben": False, "Cid": False}
+
+
+def test_added_row_without_a_name_is_ignored():
+    record, moderators_df = roster_after(
+        {"added_rows": [{"is_active": True}, {"moderator": "Dee", "is_active": True}]}
+    )
+    assert record["remove"] == []
+    assert record["upsert"] == [{"moderator": "Dee", "is_active": True}]
+    assert as_dict(moderators_df) == {
+        "Ana": True,
+        "Ben": False,
+        "Cid": True,
+        "Dee": True,
+    }
+    assert roster_patch_record(ROSTER, {"added_rows": [{"is_active": True}]}) is None
+
+
+if __name__ == "__main__":
+    test_rename_removes_the_old_name()
+    test_edit_of_a_deleted_row_is_dropped()
+    test_added_row_without_a_name_is_ignored()
+    print("ok")
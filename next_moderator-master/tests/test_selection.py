@@ -0,0 +1,73 @@
+import random
+
+from core import RecentWindow, pick_next_mod
+
+# properties of the recent window and the draw, checked on random histories with a seeded rng
+# usage: python -m pytest tests, or python -m tests.test_selection
+
+NAMES = [f"Moderator {i}" for i in range(8)]
+RUNS = 500
+
+
+# the first `threshold` different names of a newest-first history, the slow way
+def distinct_newest(newest_first, threshold):
+    return list(dict.fromkeys(newest_first))[:threshold]
+
+
+def random_history(rng):
+    names = NAMES[: rng.randint(1, len(NAMES))]
+    return [rng.choice(names) for _ in range(rng.randint(0, 40))]
+
+
+def test_from_newest_first_holds_the_latest_distinct_names():
+    rng = random.Random(0)
+    for _ in range(RUNS):
+        newest_first = random_history(rng)
+        threshold = rng.randint(1, 5)
+        window = RecentWindow.from_newest_first(newest_first, threshold)
+        assert list(window.order) == distinct_newest(newest_first, threshold)
+        assert window.members == set(window.order)
+
+
+def test_push_keeps_the_latest_distinct_names():
+    rng = random.Random(1)
+    for _ in range(RUNS):
+        newest_first = random_history(rng)
+        threshold = rng.randint(1, 5)
+        window = RecentWindow.from_newest_first(newest_first, threshold)
+        for _ in range(rng.randint(1, 20)):
+            mod = rng.choice(NAMES)
+            window.push(mod)
+            newest_first.insert(0, mod)
+            assert list(window.order) == distinct_newest(newest_first, threshold)
+            assert window.members == set(window.order)
+
+
+def test_pick_next_mod_skips_the_window_unless_everyone_is_in_it():
+    rng = random.Random(2)
+    for run in range(RUNS):
+        newest_first = random_history(rng)
+        threshold = rng.randint(1, 5)
+        window = RecentWindow.from_newest_first(newest_first, threshold)
+        available_team = rng.sample(NAMES, rng.randint(1, len(NAMES)))
+        weights = None
+        if run % 2:
+            weights = {mod: rng.uniform(0.1, 2) for mod in available_team}
+        next_mod, everyone_recent = pick_next_mod(
+            available_team, window, rng, weights
+        )
+        assert next_mod in available_team
+        if all(mod in window for mod in available_team):
+            assert everyone_recent
+            # whoever moderated the longest ago, the latest of them in the newest-first history
+            assert next_mod == max(available_team, key=newest_first.index)
+        else:
+            assert not everyone_recent
+            assert next_mod not in window
+
+
+if __name__ == "__main__":
+    test_from_newest_first_holds_the_latest_distinct_names()
+    test_push_keeps_the_latest_distinct_names()
+    test_pick_next_mod_skips_the_window_unless_everyone_is_in_it()
+    print("ok")
@@ -0,0 +1,40 @@
+import pytest
+
+from storage import LocalFiles, WriteConflict, write_optimistically
+
+# the optimistic write shared by the roster shard and the storages
+# usage: python -m pytest tests
+
+
+def test_write_is_repeated_on_top_of_a_concurrent_write(tmp_path):
+    files = LocalFiles(str(tmp_path))
+    files.write("count", b"0")
+    attempts = []
+
+    def attempt():
+        data, etag = files.read_versioned("count")
+        if not attempts:
+            # someone else writes between our read and our write
+            files.write("count", b"5")
+        attempts.append(data)
+        count = int(data) + 1
+        return str(count).encode(), etag, count
+
+    count, etag = write_optimistically(files, "count", attempt)
+    assert attempts == [b"0", b"5"]
+    assert count == 6
+    assert files.read("count") == b"6"
+    assert etag == files.etag("count")
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    files = LocalFiles(str(tmp_path))
+    files.write("count", b"0")
+
+    def attempt():
+        data, etag = files.read_versioned("count")
+        files.write("count", data + b"0")
+        return b"1", etag, None
+
+    with pytest.raises(WriteConflict, match="gave up after 3 attempts"):
+        write_optimistically(files, "count", attempt, max_attempts=3)
@@ -0,0 +1,52 @@
+import datetime as dt
+import io
+
+import openpyxl
+
+from workbook import read_workbook
+
+# reading moderators.xlsx files that were edited by hand
+# usage: python -m pytest tests, or python -m tests.test_workbook
+
+
+def hand_edited_workbook(standup_rows, retro_rows):
+    workbook = openpyxl.Workbook()
+    moderators = workbook.active
+    moderators.title = "moderators"
+    moderators.append(["moderator", "is_active"])
+    moderators.append(["Ana", "TRUE"])
+    moderators.append(["Ben", False])
+    for sheet_name, rows in [
+        ("standup_history", standup_rows),
+        ("retrospective_history", retro_rows),
+    ]:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(["date", "moderator"])
+        for row in rows:
+            worksheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def test_rows_with_a_blank_date_are_skipped():
+    blob_file = hand_edited_workbook(
+        [
+            [dt.datetime(2026, 10, 12), "Ana"],
+            [None, "Ben"],
+            ["2026-10-14", "Ben"],
+            ["  ", "Ana"],
+        ],
+        [[None, "Ana"]],
+    )
+    moderators_df, standup_df, retro_df = read_workbook(blob_file)
+    assert list(moderators_df["is_active"]) == [True, False]
+    assert list(standup_df["date"]) == [dt.date(2026, 10, 12), dt.date(2026, 10, 14)]
+    assert list(standup_df["moderator"]) == ["Ana", "Ben"]
+    assert list(retro_df.columns) == ["date", "moderator"]
+    assert retro_df.empty
+
+
+if __name__ == "__main__":
+    test_rows_with_a_blank_date_are_skipped()
+    print("ok")
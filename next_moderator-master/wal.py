@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# saves that don't wait for the upload: the records are first appended to a local
+# write-ahead file (and fsynced), then a background thread uploads them with
+# storage.append. Whatever piles up while an upload is running or failing goes out together
+# in the next one, failed uploads are retried with a growing delay. Uploaded entries are
+# removed from the file, so after a crash or restart everything still in it is pending and
+# is uploaded again. Records are idempotent, so an entry that was uploaded just before a
+# crash does no harm when it goes out twice.
+# The file must only be used by one process, e.g. a directory on the server's own disk, and
+# by one queue at a time: close() waits for a running upload and leaves the rest in the file
+# for the next queue.
+
+
+class WriteAheadQueue:
+    def __init__(
+        self, storage, path, on_flush=None, retry_seconds=1, max_retry_seconds=300
+    ):
+        self.storage = storage
+        self.path = path
+        self.on_flush = on_flush  # called after every successful upload
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.condition = threading.Condition()
+        self.closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # (records, future) in the order they were written, the uploaded ones are removed
+        self.pending = [(records, Future()) for records in self.recover()]
+        self.thread = threading.Thread(
+            target=self.run, name="write-ahead-queue", daemon=True
+        )
+        self.thread.start()
+
+    # the entries left in the file, a line that was cut off by a crash was never acknowledged
+    def recover(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping a damaged entry of %s", self.path)
+        if entries:
+            logger.info("Recovered %d pending saves from %s", len(entries), self.path)
+        return entries
+
+    # returns once the records are on disk, with a future that gets the result of
+    # storage.append for the upload they went out in
+    def submit(self, records):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The write queue was closed")
+            with open(self.path, "ab") as f:
+                f.write(json.dumps(records).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending.append((records, future))
+            self.condition.notify()
+        return future
+
+    # the records that are not uploaded yet, oldest first, to apply on top of loaded data
+    def pending_records(self):
+        with self.condition:
+            return [record for records, _ in self.pending for record in records]
+
+    # what is left after an upload replaces the file at once, a crash leaves the old or the
+    # new version but never half of one
+    def rewrite(self):
+        with open(self.path + ".tmp", "wb") as f:
+            for records, _ in self.pending:
+                f.write(json.dumps(records).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+
+    def run(self):
+        failures = 0
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                batch = list(self.pending)
+            records = [record for batch_records, _ in batch for record in batch_records]
+            try:
+                result = self.storage.append(records)
+            except Exception:
+                failures += 1
+                delay = min(
+                    self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds
+                )
+                logger.exception(
+                    "Uploading %d records failed, retrying in %ds", len(records), delay
+                )
+                with self.condition:
+                    self.condition.wait_for(lambda: self.closed, delay)
+                continue
+            failures = 0
+            # before the records stop being pending, so a rerun in between never sees the
+            # data without them
+            if self.on_flush is not None:
+                try:
+                    self.on_flush()
+                except Exception:
+                    logger.exception("The callback after an upload failed")
+            with self.condition:
+                # new entries were only added at the end while uploading
+                del self.pending[: len(batch)]
+                self.rewrite()
+            for _, future in batch:
+                future.set_result(result)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
@@ -0,0 +1,50 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# keeps the version of the stored data (its etag) and of the roster for the whole process.
+# Reruns only read them from memory, a background thread asks the storage for them every
+# `refresh_seconds`, and saves of this process refresh them right away. Every new version is
+# published to the subscribers, e.g. a StateStore that loads it ahead of time.
+# close() stops the thread.
+
+
+class VersionWatcher:
+    def __init__(self, storage, refresh_seconds=30):
+        self.storage = storage
+        self.refresh_seconds = refresh_seconds
+        self.version = storage.version()
+        self.roster_version = storage.roster.version()
+        self.subscribers = []  # called with (version, roster_version) after a change
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="version-watcher", daemon=True
+        )
+        self.thread.start()
+
+    # returns True if the version of the data or of the roster changed
+    def refresh(self):
+        version = self.storage.version()
+        roster_version = self.storage.roster.version()
+        changed = (version, roster_version) != (self.version, self.roster_version)
+        self.version, self.roster_version = version, roster_version
+        if changed and version is not None:
+            for subscriber in self.subscribers:
+                try:
+                    subscriber(version, roster_version)
+                except Exception:
+                    logger.exception("Publishing the data version failed")
+        return changed
+
+    def run(self):
+        while not self.stopped.wait(self.refresh_seconds):
+            try:
+                if self.refresh() and not self.subscribers:
+                    # fills the etag cache of the files, the next rerun only has to parse
+                    self.storage.load()
+            except Exception:
+                logger.exception("Refreshing the data version failed")
+
+    def close(self):
+        self.stopped.set()
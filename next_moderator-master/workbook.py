@@ -0,0 +1,80 @@
+import io
+import datetime as dt
+
+import openpyxl
+import pandas as pd
+
+# the sheets of moderators.xlsx, in the order get_data() returns them
+SHEETS = ("moderators", "standup_history", "retrospective_history")
+
+
+# dates are written as date cells by xlsxwriter, but older files may still hold "YYYY-MM-DD" text
+def to_date(value):
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    return dt.date.fromisoformat(str(value).strip()[:10])
+
+
+# booleans come back as bool cells, or as "TRUE"/"FALSE" text if someone edited the file by hand
+def to_bool(value):
+    if isinstance(value, str):
+        return value.strip().upper() == "TRUE"
+    return bool(value)
+
+
+# per column converters, applied while the rows are streamed out of the sheet
+CONVERTERS = {
+    "date": to_date,
+    "is_active": to_bool,
+}
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def read_sheet(worksheet):
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, ())
+    # read-only mode can yield trailing empty rows when the stored sheet dimension is off
+    rows = [row for row in rows if any(value is not None for value in row)]
+    if "date" in header:
+        # a draw without a date can not be shown or counted, so a blank date cell drops its row
+        # instead of failing the whole load
+        position = header.index("date")
+        rows = [row for row in rows if not is_blank(row[position])]
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+
+    data = {}
+    for name, values in zip(header, columns):
+        converter = CONVERTERS.get(name)
+        if converter is not None:
+            values = [converter(value) for value in values]
+        data[name] = list(values)
+    df = pd.DataFrame(data, columns=list(header))
+    if "is_active" in df.columns:
+        df["is_active"] = df["is_active"].astype(bool)
+    return df
+
+
+# open the downloaded bytes once and stream every sheet out of the same workbook
+def read_workbook(blob_file):
+    workbook = openpyxl.load_workbook(
+        io.BytesIO(blob_file), read_only=True, data_only=True, keep_links=False
+    )
+    try:
+        return tuple(read_sheet(workbook[sheet_name]) for sheet_name in SHEETS)
+    finally:
+        workbook.close()
+
+
+# write the frames back as one workbook, one sheet per frame in SHEETS order
+def write_workbook(frames):
+    output = io.BytesIO()
+    writer = pd.ExcelWriter(output, engine="xlsxwriter")
+    for df, sheet_name in zip(frames, SHEETS):
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+    writer.close()
+    return output.getvalue()